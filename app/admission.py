@@ -0,0 +1,143 @@
+"""Admission control for batch work, budgeted by title count.
+
+A `/normalise-batch` request of 50,000 titles costs thousands of times more
+than one of 10, so counting requests says little about load. `AdmissionController`
+admits requests while the titles in flight fit in `max_titles`. Requests that
+do not fit wait in a FIFO queue of at most `max_queue` requests for up to
+`max_wait` seconds. A request is refused at once (`Rejected`, 429) when the
+queue is full and after waiting too long (503); both carry a Retry-After
+estimate from the recent completion rate. A request bigger than the whole
+budget is charged the whole budget, so it runs, alone.
+
+Use from event loop code only:
+
+    async with controller.admit(len(titles)) as waited:
+        ...
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+# Seconds of completions used to estimate the drain rate for Retry-After
+RATE_WINDOW = 10.0
+MAX_RETRY_AFTER = 60
+
+
+class Rejected(Exception):
+    """A request refused by admission control, with the HTTP status and Retry-After to send."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(f"{reason}: retry after {retry_after}s")
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Titles-in-flight budget with a bounded FIFO wait queue."""
+
+    def __init__(self, max_titles: int, max_queue: int = 64, max_wait: float = 5.0):
+        if max_titles < 1:
+            raise ValueError("max_titles must be >= 1")
+        if max_queue < 0:
+            raise ValueError("max_queue must be >= 0")
+        self.max_titles = max_titles
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0        # titles charged to admitted requests
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "timeout": 0}
+        self._queue = deque()     # [cost, future] of waiting requests
+        self._queued_titles = 0
+        self._done = deque()      # (finish time, titles) within RATE_WINDOW
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def queued_titles(self) -> int:
+        return self._queued_titles
+
+    def retry_after(self) -> int:
+        """Seconds until the work ahead of a new request should have drained."""
+        self._trim(time.monotonic())
+        done = sum(titles for _, titles in self._done)
+        if not done:
+            return 1
+        rate = done / RATE_WINDOW
+        return max(1, min(MAX_RETRY_AFTER, math.ceil((self.in_flight + self._queued_titles) / rate)))
+
+    def check_queue(self) -> None:
+        """Raise `Rejected` (429) now if a request of any size would find the queue full.
+
+        Lets a caller refuse a request before paying to read and parse it;
+        `admit` still applies the full check once its size is known.
+        """
+        if (self._queue or self.in_flight >= self.max_titles) and len(self._queue) >= self.max_queue:
+            self.rejected["queue_full"] += 1
+            raise Rejected(429, "queue_full", self.retry_after())
+
+    def _trim(self, now: float) -> None:
+        while self._done and self._done[0][0] < now - RATE_WINDOW:
+            self._done.popleft()
+
+    @asynccontextmanager
+    async def admit(self, titles: int):
+        """Hold `titles` of the budget for the body of the block; yields seconds spent queued."""
+        cost = max(1, min(titles, self.max_titles))
+        start = time.monotonic()
+        await self._acquire(cost)
+        waited = time.monotonic() - start
+        self.admitted += 1
+        try:
+            yield waited
+        finally:
+            self._release(cost, titles)
+
+    async def _acquire(self, cost: int) -> None:
+        if not self._queue and self.in_flight + cost <= self.max_titles:
+            self.in_flight += cost
+            return
+        if len(self._queue) >= self.max_queue:
+            self.rejected["queue_full"] += 1
+            raise Rejected(429, "queue_full", self.retry_after())
+        future = asyncio.get_running_loop().create_future()
+        waiter = [cost, future]
+        self._queue.append(waiter)
+        self._queued_titles += cost
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            cancelled = isinstance(e, asyncio.CancelledError)
+            if future.done():
+                if not cancelled:
+                    return  # admitted just as the wait ran out
+                self._release(cost, 0)
+            else:
+                future.cancel()
+                self._queue.remove(waiter)
+                self._queued_titles -= cost
+                self._wake()  # a smaller request behind us may fit now
+            if cancelled:
+                raise
+            self.rejected["timeout"] += 1
+            raise Rejected(503, "timeout", self.retry_after()) from None
+
+    def _release(self, cost: int, titles: int) -> None:
+        self.in_flight -= cost
+        if titles:
+            now = time.monotonic()
+            self._done.append((now, titles))
+            self._trim(now)
+        self._wake()
+
+    def _wake(self) -> None:
+        # Strict FIFO: a big request at the head is not overtaken by smaller ones
+        while self._queue and self.in_flight + self._queue[0][0] <= self.max_titles:
+            cost, future = self._queue.popleft()
+            self._queued_titles -= cost
+            self.in_flight += cost
+            future.set_result(None)
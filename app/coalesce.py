@@ -0,0 +1,120 @@
+"""Single-flight and micro-batching for concurrent single-title calls.
+
+Without coalescing every `/normalise` call is handed to the threadpool on its
+own, so N concurrent calls cost N thread hand-offs even when they all ask for
+the same title. `Coalescer` sits between the endpoint and the threadpool:
+
+- Calls for a key that is already being computed wait for that computation
+  instead of starting their own (single flight).
+- Distinct keys are collected into a micro-batch that is computed in one
+  threadpool call. A batch is dispatched as soon as it holds `max_batch` keys
+  or its first key has waited `max_wait` seconds, whichever comes first, so
+  the latency added to a call is at most `max_wait`. When no batch is running
+  the pending keys are dispatched at once: a lone call at low load waits for
+  nothing.
+
+A `Coalescer` must only be used from event loop code (one loop at a time);
+`compute` runs in the threadpool.
+"""
+import asyncio
+from typing import Callable
+
+from starlette.concurrency import run_in_threadpool
+
+
+def _compute_all(compute: Callable, keys: list) -> list:
+    results = []
+    for key in keys:
+        try:
+            results.append((True, compute(key)))
+        except Exception as e:  # reported to the callers waiting for this key only
+            results.append((False, e))
+    return results
+
+
+class Coalescer:
+    """Shares and batches calls of `compute(key)`.
+
+    `stats` counts calls (`requests`), calls that joined a computation already
+    in flight (`shared`), keys computed (`computed`), batches by what
+    dispatched them (`flushes`: "size", "timer" or "idle") and batches per
+    size (`batch_sizes[n]`).
+    """
+
+    def __init__(self, compute: Callable, max_batch: int = 64, max_wait: float = 0.001):
+        if max_batch < 1:
+            raise ValueError("max_batch must be >= 1")
+        if max_wait < 0:
+            raise ValueError("max_wait must be >= 0")
+        self.compute = compute
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._inflight = {}   # key -> future shared by every caller of that key
+        self._pending = []    # keys waiting for the next batch
+        self._timer = None
+        self._running = 0     # batches in the threadpool
+        self._tasks = set()   # keeps running batches referenced
+        self.stats = {
+            "requests": 0,
+            "shared": 0,
+            "computed": 0,
+            "flushes": {"size": 0, "timer": 0, "idle": 0},
+            "batch_sizes": [0] * (max_batch + 1),
+        }
+
+    async def submit(self, key):
+        """The result of `compute(key)`, possibly computed for another caller too."""
+        self.stats["requests"] += 1
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["shared"] += 1
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._inflight[key] = future
+            self._pending.append(key)
+            if len(self._pending) >= self.max_batch:
+                self._flush("size")
+            elif not self._running:
+                self._flush("idle")
+            elif self._timer is None:
+                self._timer = loop.call_later(self.max_wait, self._flush, "timer")
+        # A caller that goes away must not cancel the computation others share
+        return await asyncio.shield(future)
+
+    def _flush(self, reason: str) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        keys, self._pending = self._pending, []
+        self.stats["flushes"][reason] += 1
+        self.stats["batch_sizes"][len(keys)] += 1
+        self.stats["computed"] += len(keys)
+        self._running += 1
+        task = asyncio.get_running_loop().create_task(self._run(keys))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, keys: list) -> None:
+        results = None
+        try:
+            results = await run_in_threadpool(_compute_all, self.compute, keys)
+        except Exception as e:  # the threadpool itself failed
+            results = [(False, e)] * len(keys)
+        finally:
+            self._running -= 1
+            for i, key in enumerate(keys):
+                future = self._inflight.pop(key)
+                if future.done():
+                    continue
+                if results is None:  # cancelled, e.g. at shutdown
+                    future.cancel()
+                elif results[i][0]:
+                    future.set_result(results[i][1])
+                else:
+                    future.set_exception(results[i][1])
+        # Keys that arrived while this batch ran go now rather than at their timer
+        if self._pending and not self._running:
+            self._flush("idle")
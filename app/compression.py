@@ -0,0 +1,111 @@
+"""gzip (and, when the `zstandard` package is installed, zstd) codecs for HTTP bodies.
+
+Decoders work incrementally and hand out output in bounded pieces, so a small
+compressed upload cannot expand into one huge allocation; callers enforce the
+total decompressed size.
+"""
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+# Largest piece of decompressed output produced at a time
+PIECE_SIZE = 256 * 1024
+# zstd decompressobj has no output limit, so feed it small input slices instead
+ZSTD_INPUT_SLICE = 256
+
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+class DecompressionError(ValueError):
+    pass
+
+
+class GzipDecoder:
+    def __init__(self):
+        self._d = zlib.decompressobj(_GZIP_WBITS)
+
+    def decompress(self, data: bytes):
+        """Yield the decompressed output of `data` in pieces of at most PIECE_SIZE bytes."""
+        while data:
+            try:
+                out = self._d.decompress(data, PIECE_SIZE)
+            except zlib.error as e:
+                raise DecompressionError(f"invalid gzip body: {e}") from None
+            if out:
+                yield out
+            if self._d.eof:
+                # concatenated gzip members are allowed
+                data = self._d.unused_data
+                if data:
+                    self._d = zlib.decompressobj(_GZIP_WBITS)
+            else:
+                data = self._d.unconsumed_tail
+
+    def finish(self) -> None:
+        if not self._d.eof:
+            raise DecompressionError("truncated gzip body")
+
+
+class ZstdDecoder:
+    def __init__(self):
+        self._d = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data: bytes):
+        for i in range(0, len(data), ZSTD_INPUT_SLICE):
+            try:
+                out = self._d.decompress(data[i:i + ZSTD_INPUT_SLICE])
+            except zstandard.ZstdError as e:
+                raise DecompressionError(f"invalid zstd body: {e}") from None
+            if out:
+                yield out
+
+    def finish(self) -> None:
+        if not self._d.eof:
+            raise DecompressionError("truncated zstd body")
+
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        self._c = zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        """Compress `data`; non-final chunks are flushed so a streamed reply stays live."""
+        return self._c.compress(data) + self._c.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class ZstdEncoder:
+    def __init__(self, level: int):
+        self._c = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        mode = zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        return self._c.compress(data) + self._c.flush(mode)
+
+
+DECODERS = {"gzip": GzipDecoder, "x-gzip": GzipDecoder}
+ENCODERS = {"gzip": GzipEncoder}
+if zstandard is not None:
+    DECODERS["zstd"] = ZstdDecoder
+    ENCODERS["zstd"] = ZstdEncoder
+
+
+def choose_encoding(accept_encoding: str):
+    """Pick the response encoding from an Accept-Encoding header (zstd preferred), or None."""
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    for name in ("zstd", "gzip"):
+        if name in ENCODERS and (name in accepted or "*" in accepted):
+            return name
+    return None
@@ -0,0 +1,253 @@
+"""Asynchronous bulk normalisation jobs spooled to local disk.
+
+An upload (plain text or NDJSON, one title per line, as for
+/normalise-stream) is written to a spool file as it arrives and queued as a
+job. A small thread pool normalises queued jobs chunk by chunk into a
+results file of NDJSON records, one per input line and in input order, which
+can be read in pages or streamed while the job is still running.
+
+Jobs live in memory and in a private spool directory removed at shutdown;
+they do not survive a restart.
+"""
+import asyncio
+import bisect
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import AsyncIterator, Callable, List, Optional
+
+from app.streaming import iter_line_chunks, render_results
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = frozenset({DONE, FAILED, CANCELLED})
+
+CHUNK_SIZE = 5000
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_id: str, ndjson: bool, directory: str):
+        self.id = job_id
+        self.ndjson = ndjson
+        self.input_path = os.path.join(directory, f"{job_id}.in")
+        self.output_path = os.path.join(directory, f"{job_id}.out")
+        self.status = QUEUED
+        self.error = None
+        self.lines = 0          # input lines spooled
+        self.lines_done = 0     # input lines normalised
+        self.rows = 0           # result records written (and flushed)
+        self.output_bytes = 0
+        # (first row, byte offset) of every chunk written, for paging
+        self.chunk_starts = [(0, 0)]
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancelled = False
+
+    @property
+    def duration_seconds(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    def info(self) -> dict:
+        duration = self.duration_seconds
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "lines": self.lines,
+            "lines_done": self.lines_done,
+            "rows": self.rows,
+            "progress": round(self.lines_done / self.lines, 4) if self.lines else 1.0,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_seconds": round(duration, 4) if duration is not None else None,
+            "rows_per_second": round(self.rows / duration, 1) if duration else None,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Registry, spool directory and worker threads for normalisation jobs.
+
+    The spool directory and threads are created on first use, so importing
+    the app stays side-effect free. `on_finish(job)` is called from the
+    worker thread once a job leaves the running state.
+    """
+
+    def __init__(self, spool_root: str, workers: int = 1, chunk_size: int = CHUNK_SIZE,
+                 max_queued: int = 100, retention_seconds: float = 3600,
+                 normalise: Callable[[str], str] = None, on_finish: Callable[[Job], None] = None):
+        self.spool_root = spool_root
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_queued = max_queued
+        self.retention_seconds = retention_seconds
+        self.normalise = normalise
+        self.on_finish = on_finish
+        self.jobs = {}
+        self._directory = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> str:
+        with self._lock:
+            if self._directory is None:
+                os.makedirs(self.spool_root, exist_ok=True)
+                self._directory = tempfile.mkdtemp(prefix="jobs-", dir=self.spool_root)
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix="normalise-job")
+            return self._directory
+
+    def close(self) -> None:
+        """Cancel outstanding jobs, stop the workers and remove the spool directory."""
+        with self._lock:
+            executor, directory = self._executor, self._directory
+            self._executor = self._directory = None
+        for job in self.jobs.values():
+            job.cancelled = True
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+        self.jobs.clear()
+
+    def counts(self) -> dict:
+        counts = {QUEUED: 0, RUNNING: 0}
+        for job in list(self.jobs.values()):
+            if job.status in counts:
+                counts[job.status] += 1
+        return counts
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    async def submit(self, chunks: AsyncIterator[bytes], ndjson: bool) -> Job:
+        """Spool an uploaded body to disk and queue it. Raises JobQueueFull or LineTooLong."""
+        self._expire()
+        if self.counts()[QUEUED] >= self.max_queued:
+            raise JobQueueFull(f"{self.max_queued} jobs already queued")
+        job = Job(uuid.uuid4().hex, ndjson, self._ensure_started())
+        try:
+            with open(job.input_path, "wb") as f:
+                async for lines in iter_line_chunks(chunks):
+                    # One chunk into the page cache: cheaper than a thread hop
+                    f.write(b"\n".join(lines) + b"\n")
+                    job.lines += len(lines)
+        except BaseException:
+            _remove(job.input_path)
+            raise
+        self.jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def delete(self, job_id: str) -> bool:
+        """Cancel a job if it is still queued or running and remove its files."""
+        job = self.jobs.pop(job_id, None)
+        if job is None:
+            return False
+        job.cancelled = True
+        if job.status in FINISHED:
+            _remove(job.input_path)
+            _remove(job.output_path)
+        # otherwise the worker removes them when it notices the cancellation
+        return True
+
+    def _expire(self) -> None:
+        if self.retention_seconds <= 0:
+            return
+        cutoff = time.time() - self.retention_seconds
+        for job in list(self.jobs.values()):
+            if job.status in FINISHED and job.finished_at < cutoff:
+                self.delete(job.id)
+
+    def _run(self, job: Job) -> None:
+        if job.cancelled:
+            job.status, job.finished_at = CANCELLED, time.time()
+            _remove(job.input_path)
+            return
+        job.status, job.started_at = RUNNING, time.time()
+        try:
+            with open(job.input_path, "rb") as src, open(job.output_path, "wb") as dst:
+                while not job.cancelled:
+                    lines = [line[:-1] for line in islice(src, self.chunk_size)]
+                    if not lines:
+                        break
+                    data = render_results(lines, job.ndjson, job.lines_done + 1, self.normalise)
+                    dst.write(data)
+                    dst.flush()
+                    # Publish the chunk only once its bytes are readable
+                    job.chunk_starts.append((job.rows + data.count(b"\n"), job.output_bytes + len(data)))
+                    job.output_bytes += len(data)
+                    job.rows = job.chunk_starts[-1][0]
+                    job.lines_done += len(lines)
+            job.status = CANCELLED if job.cancelled else DONE
+        except Exception as e:
+            job.status, job.error = FAILED, str(e)
+        finally:
+            job.finished_at = time.time()
+            _remove(job.input_path)
+            if job.cancelled:
+                _remove(job.output_path)
+            if self.on_finish is not None:
+                self.on_finish(job)
+
+    def read_rows(self, job: Job, offset: int, limit: int) -> List[bytes]:
+        """Return up to `limit` result lines starting at row `offset` (0-based)."""
+        rows, end = job.rows, job.output_bytes
+        if offset >= rows or limit <= 0:
+            return []
+        starts = job.chunk_starts
+        i = bisect.bisect_right(starts, (offset, float("inf"))) - 1
+        first_row, position = starts[i]
+        with open(job.output_path, "rb") as f:
+            f.seek(position)
+            out = []
+            row = first_row
+            while row < offset + limit and row < rows and f.tell() < end:
+                line = f.readline()
+                if row >= offset:
+                    out.append(line.rstrip(b"\n"))
+                row += 1
+        return out
+
+    async def iter_results(self, job: Job, block_size: int = 64 * 1024,
+                           poll_interval: float = 0.05) -> AsyncIterator[bytes]:
+        """Yield the results file as it grows, until the job finishes."""
+        position = 0
+        f = None
+        try:
+            while not job.cancelled:
+                finished = job.status in FINISHED
+                end = job.output_bytes
+                if position < end:
+                    if f is None:
+                        f = open(job.output_path, "rb")
+                    f.seek(position)
+                    while position < end:
+                        data = f.read(min(block_size, end - position))
+                        position += len(data)
+                        yield data
+                elif finished:
+                    return
+                else:
+                    await asyncio.sleep(poll_interval)
+        finally:
+            if f is not None:
+                f.close()
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,228 @@
+"""Precomputed, memory-mapped messy → clean title index.
+
+Built offline by running the rule engine over a corpus of known titles:
+
+    python -m app.lookup build "program_names (2).csv" dumps/*.txt -o titles.idx
+    python -m app.lookup info titles.idx
+
+The service maps the file read-only (`TITLE_INDEX=titles.idx`), so every
+worker process shares one copy through the page cache. A lookup hashes the
+title into an open-addressing table and compares the stored title bytes,
+so it is O(1) with no per-process loading cost. The index records
+the rule-set version it was built with and is only consulted while that
+version is active; titles it does not hold fall back to the regex engine.
+
+File layout (integers in the builder's native byte order, recorded in the
+metadata):
+
+    header    MAGIC, entry count (u64), table size (u64, a power of two),
+              metadata length (u32), padding
+    metadata  JSON object, padded to 8 bytes
+    hashes    table size x u32: crc32(messy title) of the entry in each slot
+    entries   table size x u32: entry number + 1 in each slot, 0 if empty
+    offsets   (count + 1) x u64, start of each record within `records`
+    records   u32 messy length, messy title, clean title (UTF-8)
+
+Entries are placed at slot `hash & (size - 1)`, or the next free slot after
+it; the table is at most half full.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+from app.bulk import _open_rows
+from app.model import get_engine, normalise_many, swap_engine
+
+MAGIC = b"TTLIDX1\0"
+_HEADER = struct.Struct("<8sQQI4x")
+_LENGTH = struct.Struct("<I")
+
+
+def _encode(title: str) -> bytes:
+    return title.encode("utf-8", "surrogatepass")
+
+
+def _pad(size: int) -> bytes:
+    return b"\0" * (-size % 8)
+
+
+class TitleIndex:
+    """Read-only view of an index file. Raises ValueError if the file is not a valid index."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._views = []
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._map()
+        except (struct.error, TypeError, ValueError) as e:
+            self.close()
+            raise ValueError(f"{path}: invalid title index: {e}") from None
+        self.ruleset = self.meta.get("ruleset")
+        self.hits = 0
+        self.misses = 0
+
+    def _map(self) -> None:
+        magic, count, size, meta_len = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError("bad magic")
+        if size & (size - 1) or size <= count:
+            raise ValueError("bad table size")
+        pos = _HEADER.size
+        self.meta = json.loads(self._mm[pos:pos + meta_len])
+        if self.meta.get("byteorder") != sys.byteorder:
+            raise ValueError(f"built on a {self.meta.get('byteorder')}-endian machine")
+        pos += meta_len + (-meta_len % 8)
+        view = memoryview(self._mm)
+        self._views.append(view)
+        self._hashes = view[pos:pos + 4 * size].cast("I")
+        self._views.append(self._hashes)
+        pos += 4 * size
+        self._slots = view[pos:pos + 4 * size].cast("I")
+        self._views.append(self._slots)
+        pos += 4 * size
+        self._offsets = view[pos:pos + 8 * (count + 1)].cast("Q")
+        self._views.append(self._offsets)
+        self._records = pos + 8 * (count + 1)
+        if self._records + self._offsets[count] != len(self._mm):
+            raise ValueError("truncated")
+        self.count = count
+        self._mask = size - 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def get(self, messy_title: str):
+        """Return the stored clean title, or None if the index does not hold `messy_title`."""
+        data = _encode(messy_title)
+        h = zlib.crc32(data)
+        hashes, slots, offsets, mm, mask = self._hashes, self._slots, self._offsets, self._mm, self._mask
+        slot = h & mask
+        while True:
+            entry = slots[slot]
+            if not entry:
+                break
+            if hashes[slot] == h:
+                start = self._records + offsets[entry - 1]
+                (size,) = _LENGTH.unpack_from(mm, start)
+                start += _LENGTH.size
+                if mm[start:start + size] == data:
+                    self.hits += 1
+                    return mm[start + size:self._records + offsets[entry]].decode("utf-8", "surrogatepass")
+            slot = (slot + 1) & mask
+        self.misses += 1
+        return None
+
+    def close(self) -> None:
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mm.close()
+
+
+def load_title_index(path, engine=None) -> TitleIndex:
+    """Map the index at `path`, rejecting it unless it was built for `engine`'s rules.
+
+    Raises OSError or ValueError.
+    """
+    engine = engine or get_engine()
+    index = TitleIndex(path)
+    if index.ruleset != engine.version:
+        index.close()
+        raise ValueError(f"{path}: built for rule set {index.ruleset}, "
+                         f"active rules are {engine.version} ({engine.pack_version})")
+    return index
+
+
+def write_index(path, pairs, meta: dict) -> int:
+    """Write distinct (messy, clean) pairs to an index file at `path` and return the entry count."""
+    entries = [(_encode(m), _encode(c)) for m, c in pairs]
+    size = 8
+    while size < 2 * len(entries):
+        size *= 2
+    hashes = array("I", bytes(4 * size))
+    slots = array("I", bytes(4 * size))
+    offsets = array("Q", [0])
+    for number, (messy, clean) in enumerate(entries, 1):
+        h = zlib.crc32(messy)
+        slot = h & (size - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (size - 1)
+        hashes[slot], slots[slot] = h, number
+        offsets.append(offsets[-1] + _LENGTH.size + len(messy) + len(clean))
+    meta = {**meta, "entries": len(entries), "byteorder": sys.byteorder}
+    meta_bytes = json.dumps(meta, sort_keys=True).encode("utf-8")
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(entries), size, len(meta_bytes)))
+        f.write(meta_bytes + _pad(len(meta_bytes)))
+        hashes.tofile(f)
+        slots.tofile(f)
+        offsets.tofile(f)
+        for messy, clean in entries:
+            f.write(_LENGTH.pack(len(messy)) + messy + clean)
+    # Workers may have the old file mapped; replacing (not rewriting) it keeps their view intact
+    os.replace(tmp, path)
+    return len(entries)
+
+
+def build(sources, output, column: int = 0, header: bool = False, text: bool = None) -> dict:
+    """Normalise every distinct title in `sources` with the active rules and write the index."""
+    start = time.perf_counter()
+    unique = {}
+    for source in sources:
+        as_text = text if text is not None else not source.lower().endswith(".csv")
+        for i, row in enumerate(_open_rows(source, as_text)):
+            if header and i == 0:
+                continue
+            if column < len(row):
+                unique.setdefault(row[column], None)
+    titles = list(unique)
+    engine = get_engine()
+    count = write_index(output, zip(titles, normalise_many(titles)), {
+        "ruleset": engine.version,
+        "pack_version": engine.pack_version,
+        "sources": [os.path.basename(s) for s in sources],
+        "built_at": time.time(),
+    })
+    return {"entries": count, "bytes": os.path.getsize(output), "ruleset": engine.version,
+            "seconds": round(time.perf_counter() - start, 3)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.lookup", description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="build an index from CSV or text corpora")
+    b.add_argument("sources", nargs="+", help="CSV files, or text files with one title per line")
+    b.add_argument("-o", "--output", required=True, help="index file to write")
+    b.add_argument("--column", type=int, default=0, help="0-based index of the title column in CSVs")
+    b.add_argument("--header", action="store_true", help="skip the first row of every source")
+    b.add_argument("--rule-pack", help="build for this rule pack instead of the built-in RULES")
+    i = sub.add_parser("info", help="print an index's metadata")
+    i.add_argument("index")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        index = TitleIndex(args.index)
+        print(json.dumps(index.meta, indent=2))
+        index.close()
+        return 0
+    if args.rule_pack:
+        from app.rulepacks import load_rule_pack
+        swap_engine(load_rule_pack(args.rule_pack))
+    stats = build(args.sources, args.output, column=args.column, header=args.header)
+    print(f"{stats['entries']} titles, {stats['bytes']} bytes, rule set {stats['ruleset']}, "
+          f"built in {stats['seconds']:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,185 @@
-from fastapi import FastAPI, HTTPException, Request, Response
-from pydantic import BaseModel
-from typing import List
-from app.model import normalise_title
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.requests import ClientDisconnect
+from typing import Dict, List
+from app.admission import AdmissionController, Rejected
+from app.coalesce import Coalescer
+from app.jobs import FINISHED, JobManager, JobQueueFull
+from app.lookup import load_title_index
+from app.matching import CatalogueIndex, load_catalogue
+from app.middleware import ContentEncodingMiddleware, MetricsMiddleware
+from app.model import (
+    TITLE_CACHE,
+    cached_title,
+    get_engine,
+    get_title_index,
+    normalise_many,
+    normalise_title,
+    set_observer,
+    set_title_index,
+    swap_engine,
+)
+from app.multiproc import SnapshotCollector, multiproc_dir, write_snapshot
+from app.rulepacks import load_rule_pack, parse_rule_pack
+from app.streaming import NDJSON_CONTENT_TYPES, LineTooLong, iter_line_chunks, render_results
 from prometheus_client import (
     Counter,
     Histogram,
+    Summary,
     generate_latest,
     CONTENT_TYPE_LATEST,
     CollectorRegistry,
 )
+from prometheus_client.multiprocess import MultiProcessCollector
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from prometheus_client.registry import Collector
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+import anyio
+import asyncio
+import bisect
+import email.message
+import json
+import logging
+import multiprocessing
+import os
+import random
+import secrets
+import tempfile
+import threading
 import time
 
-app = FastAPI(title="TV Title Normalisation Service", version="1.0")
+# Batch execution: "thread" keeps every batch in-process; "process" sends
+# batches with more than BATCH_PROCESS_THRESHOLD distinct titles to a
+# process pool created at startup, so they neither hold the GIL nor tie up
+# the threadpool that serves every other request.
+BATCH_EXECUTOR = os.environ.get("BATCH_EXECUTOR", "thread")
+BATCH_PROCESS_THRESHOLD = int(os.environ.get("BATCH_PROCESS_THRESHOLD", "5000"))
+BATCH_PROCESS_WORKERS = int(os.environ.get("BATCH_PROCESS_WORKERS", str(os.cpu_count() or 1)))
+
+# Rule packs: RULE_PACK names a pack file loaded at startup (the built-in
+# RULES are used otherwise). With RULE_PACK_WATCH_INTERVAL > 0 the file is
+# polled and re-loaded when it changes. The /admin endpoints need
+# `Authorization: Bearer $ADMIN_TOKEN` and are disabled without ADMIN_TOKEN.
+RULE_PACK = os.environ.get("RULE_PACK")
+RULE_PACK_WATCH_INTERVAL = float(os.environ.get("RULE_PACK_WATCH_INTERVAL", "0"))
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Title index: TITLE_INDEX names a file built with `python -m app.lookup build`.
+# It is memory-mapped read-only, so worker processes share it, and is ignored
+# (with an error logged) if it was built for different rules.
+TITLE_INDEX = os.environ.get("TITLE_INDEX")
+
+# Catalogue matching: CATALOGUE names a CSV (`id,title`) of canonical titles
+# loaded at startup for /match; matches scoring below MATCH_MIN_SCORE
+# (trigram Dice similarity, 0-1) are reported as no match.
+CATALOGUE = os.environ.get("CATALOGUE")
+MATCH_MIN_SCORE = float(os.environ.get("MATCH_MIN_SCORE", "0.5"))
+
+# Compressed bodies: requests may be gzip (or zstd, with `zstandard`
+# installed) encoded; reading more than MAX_DECOMPRESSED_BODY_BYTES of
+# decompressed data fails with 413 (MAX_DECOMPRESSED_STREAM_BYTES for
+# /normalise-stream, which never holds its body in memory). Responses of at
+# least COMPRESS_MIN_BYTES, and all streamed responses, are compressed when
+# the client sends Accept-Encoding.
+MAX_DECOMPRESSED_BODY_BYTES = int(os.environ.get("MAX_DECOMPRESSED_BODY_BYTES", str(64 * 1024 * 1024)))
+MAX_DECOMPRESSED_STREAM_BYTES = int(os.environ.get("MAX_DECOMPRESSED_STREAM_BYTES", str(4 * 1024 ** 3)))
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+
+# Bulk jobs: uploads are spooled under JOB_SPOOL_DIR and normalised by
+# JOB_WORKERS background threads, JOB_CHUNK_SIZE lines at a time. Submissions
+# beyond JOB_MAX_QUEUED waiting jobs get 429; finished jobs and their files
+# are dropped JOB_RETENTION_SECONDS after completion (0 keeps them).
+JOB_SPOOL_DIR = os.environ.get("JOB_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "title-normaliser-jobs"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))
+JOB_CHUNK_SIZE = int(os.environ.get("JOB_CHUNK_SIZE", "5000"))
+JOB_MAX_QUEUED = int(os.environ.get("JOB_MAX_QUEUED", "100"))
+JOB_RETENTION_SECONDS = float(os.environ.get("JOB_RETENTION_SECONDS", "3600"))
+
+# Coalescing: with NORMALISE_COALESCE=1, concurrent /normalise calls for the
+# same title share one computation and cache misses are normalised in
+# micro-batches of up to COALESCE_MAX_BATCH titles, each call waiting at most
+# COALESCE_MAX_WAIT_MS for its batch to start (see app.coalesce).
+NORMALISE_COALESCE = os.environ.get("NORMALISE_COALESCE", "0") == "1"
+COALESCE_MAX_BATCH = int(os.environ.get("COALESCE_MAX_BATCH", "64"))
+COALESCE_MAX_WAIT_MS = float(os.environ.get("COALESCE_MAX_WAIT_MS", "1"))
+
+# Admission control for /normalise-batch: at most ADMISSION_MAX_TITLES titles
+# are normalised at once; requests that do not fit wait (up to
+# ADMISSION_MAX_QUEUE of them, for ADMISSION_MAX_WAIT_SECONDS) and are
+# otherwise refused with 429/503 and Retry-After. ADMISSION_MAX_TITLES=0 turns
+# it off. While it is on, batches also run on at most BATCH_THREADS threads,
+# leaving the rest of the threadpool to /normalise and /metrics.
+ADMISSION_MAX_TITLES = int(os.environ.get("ADMISSION_MAX_TITLES", "50000"))
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.environ.get("ADMISSION_MAX_WAIT_SECONDS", "5"))
+BATCH_THREADS = int(os.environ.get("BATCH_THREADS", "2"))
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if BATCH_EXECUTOR == "process":
+        pool = ProcessPoolExecutor(
+            max_workers=BATCH_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        # Start every worker (and compile its rules) before taking traffic
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(pool, normalise_many, [""])
+                               for _ in range(BATCH_PROCESS_WORKERS)))
+        app.state.batch_pool = pool
+    watcher = None
+    if RULE_PACK and RULE_PACK_WATCH_INTERVAL > 0:
+        watcher = asyncio.create_task(_watch_rule_pack(RULE_PACK, RULE_PACK_WATCH_INTERVAL))
+    snapshots = None
+    if MULTIPROC_DIR:
+        snapshots = asyncio.create_task(_write_snapshots(MULTIPROC_DIR, METRICS_SNAPSHOT_INTERVAL))
+    try:
+        yield
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if snapshots is not None:
+            snapshots.cancel()
+            # Keep this worker's final counts once it has gone
+            write_snapshot(PROCESS_COLLECTORS, MULTIPROC_DIR)
+        JOBS.close()
+        pool = getattr(app.state, "batch_pool", None)
+        if pool is not None:
+            app.state.batch_pool = None
+            pool.shutdown(cancel_futures=True)
+
+
+app = FastAPI(title="TV Title Normalisation Service", version="1.0", lifespan=lifespan)
 
 # Prometheus metrics (custom registry: expose only request count/latency)
 PROM_REGISTRY = CollectorRegistry()
 
+# Collectors that report in-process state at scrape time. With several
+# workers (PROMETHEUS_MULTIPROC_DIR set, see app.serve) each worker writes
+# their output to a snapshot file every METRICS_SNAPSHOT_INTERVAL seconds and
+# before answering a scrape, and /metrics merges all workers' snapshots.
+PROCESS_COLLECTORS = []
+MULTIPROC_DIR = multiproc_dir()
+METRICS_SNAPSHOT_INTERVAL = float(os.environ.get("METRICS_SNAPSHOT_INTERVAL", "5"))
+
+# Worker processes serving the app, as exported by app.serve. Bulk jobs, rule
+# pack uploads and catalogue inserts only reach the worker that answers, so
+# with several workers those endpoints are refused (see _require_single_worker).
+SERVE_WORKERS = int(os.environ.get("SERVE_WORKERS", "1"))
+
+
+def _register_process_collector(collector):
+    PROM_REGISTRY.register(collector)
+    PROCESS_COLLECTORS.append(collector)
+    return collector
+
 REQUEST_COUNTER = Counter(
     "http_requests_total",
     "Total HTTP requests",
@@ -32,21 +196,402 @@ REQUEST_LATENCY = Histogram(
 )
 
 
-@app.middleware("http")
-async def metrics_middleware(request: Request, call_next):
-    path = request.url.path
-    method = request.method
-    # Avoid self-scrape noise on /metrics if desired
-    if path == "/metrics":
-        return await call_next(request)
+class TitleCacheCollector(Collector):
+    """Reads the normaliser's LRU cache statistics at scrape time."""
+
+    def collect(self):
+        stats = TITLE_CACHE.stats()
+        for name in ("hits", "misses", "evictions"):
+            yield CounterMetricFamily(
+                f"normalise_cache_{name}", f"Title cache {name}", value=stats[name]
+            )
+        yield GaugeMetricFamily("normalise_cache_size", "Entries in the title cache", value=stats["size"])
+        yield GaugeMetricFamily("normalise_cache_capacity", "Maximum entries in the title cache",
+                                value=stats["capacity"])
+
+
+_register_process_collector(TitleCacheCollector())
+
+# Normaliser instrumentation. NORMALISER_METRICS=0 switches it off entirely:
+# the series are not registered and the model never builds rule traces.
+# Per-rule timings are sampled on RULE_TIMING_SAMPLE_RATE of normalised titles.
+NORMALISER_METRICS = os.environ.get("NORMALISER_METRICS", "1") != "0"
+RULE_TIMING_SAMPLE_RATE = float(os.environ.get("RULE_TIMING_SAMPLE_RATE", "0.01"))
+
+PASSES_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50)
+
+
+class NormaliserStats(Collector):
+    """Per-rule match counts and passes-per-title, aggregated under one lock.
+
+    Cheaper per title than updating a labelled Counter and a Histogram, which
+    each take their own lock per update; the values are exported at scrape time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rule_matches = {}
+        self.passes = [0] * (len(PASSES_BUCKETS) + 1)  # last slot is +Inf
+        self.passes_sum = 0
+
+    def record(self, trace) -> None:
+        n = len(trace)
+        slot = bisect.bisect_left(PASSES_BUCKETS, n)
+        with self._lock:
+            self.passes[slot] += 1
+            self.passes_sum += n
+            matches = self.rule_matches
+            for hits in trace:
+                for index in hits:
+                    matches[index] = matches.get(index, 0) + 1
+
+    def collect(self):
+        with self._lock:
+            rule_matches = sorted(self.rule_matches.items())
+            passes = list(self.passes)
+            passes_sum = self.passes_sum
+        family = CounterMetricFamily(
+            "normaliser_rule_matches", "Rule matches while normalising titles (cache misses only)",
+            labels=["rule"],
+        )
+        for index, count in rule_matches:
+            family.add_metric([str(index)], count)
+        yield family
+        buckets, total = [], 0
+        for bound, count in zip(PASSES_BUCKETS + (float("inf"),), passes):
+            total += count
+            buckets.append(("+Inf" if bound == float("inf") else str(bound), total))
+        yield HistogramMetricFamily(
+            "normaliser_passes", "Passes over the rules needed to normalise a title",
+            buckets=buckets, sum_value=passes_sum,
+        )
+
+
+class RulePackCollector(Collector):
+    """Active rule pack version and compile time, plus swap/failure counts."""
+
+    def __init__(self):
+        self.swaps = 0
+        self.load_failures = 0
+        self.loaded_at = time.time()
+
+    def collect(self):
+        engine = get_engine()
+        info = GaugeMetricFamily("normaliser_rule_pack_info", "Active rule pack", labels=["version", "hash"])
+        info.add_metric([engine.pack_version, engine.version], 1)
+        yield info
+        yield GaugeMetricFamily("normaliser_rule_pack_compile_seconds",
+                                "Time taken to compile the active rule pack", value=engine.compile_seconds)
+        yield GaugeMetricFamily("normaliser_rule_pack_rules", "Rules in the active rule pack",
+                                value=len(engine.rules))
+        yield GaugeMetricFamily("normaliser_rule_pack_loaded_timestamp_seconds",
+                                "Unix time the active rule pack was activated", value=self.loaded_at)
+        yield CounterMetricFamily("normaliser_rule_pack_swaps", "Rule pack swaps since startup",
+                                  value=self.swaps)
+        yield CounterMetricFamily("normaliser_rule_pack_load_failures",
+                                  "Rule packs rejected by validation or unreadable", value=self.load_failures)
+
+
+RULE_PACK_STATS = RulePackCollector()
+_register_process_collector(RULE_PACK_STATS)
+
+
+def _activate(engine):
+    swap_engine(engine)
+    RULE_PACK_STATS.swaps += 1
+    RULE_PACK_STATS.loaded_at = time.time()
+    logger.info("rule pack %s (%s) active, compiled in %.1fms",
+                engine.pack_version, engine.version, engine.compile_seconds * 1000)
+    return engine
+
+
+if RULE_PACK:
+    # A bad pack at startup is fatal: better to fail the rollout than serve wrong rules
+    swap_engine(load_rule_pack(RULE_PACK))
+
+
+if TITLE_INDEX:
+    try:
+        set_title_index(load_title_index(TITLE_INDEX))
+    except (OSError, ValueError) as e:
+        # Unlike a bad rule pack this is not fatal: the regex engine gives the same answers
+        logger.error("not using title index: %s", e)
+
+
+class TitleIndexCollector(Collector):
+    """Size, state and hit/miss counts of the precomputed title index."""
+
+    def collect(self):
+        index = get_title_index()
+        if index is None:
+            return
+        yield GaugeMetricFamily("normalise_index_entries", "Titles in the precomputed index", value=len(index))
+        yield GaugeMetricFamily("normalise_index_active", "1 while the index matches the active rules",
+                                value=int(index.ruleset == get_engine().version))
+        yield CounterMetricFamily("normalise_index_hits", "Cache misses answered by the index", value=index.hits)
+        yield CounterMetricFamily("normalise_index_misses", "Index lookups that fell back to the rules",
+                                  value=index.misses)
+
+
+_register_process_collector(TitleIndexCollector())
+
+CATALOGUE_INDEX = CatalogueIndex()
+if CATALOGUE:
+    # Like a bad rule pack, a catalogue that cannot be read stops startup
+    load_catalogue(CATALOGUE, CATALOGUE_INDEX)
+
+
+class CatalogueCollector(Collector):
+    def collect(self):
+        yield GaugeMetricFamily("normalise_catalogue_size", "Canonical titles in the match catalogue",
+                                value=len(CATALOGUE_INDEX))
+
+
+_register_process_collector(CatalogueCollector())
+
+MATCH_SCORE = Histogram(
+    "normalise_match_score",
+    "Best catalogue similarity per matched title (0 when nothing was found)",
+    buckets=(0.3, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99, 1.0),
+    registry=PROM_REGISTRY,
+)
+
+
+def _normalise_key(key):
+    # Looked up at call time, so tests can patch normalise_title
+    return normalise_title(key[1])
+
+
+COALESCER = Coalescer(_normalise_key, COALESCE_MAX_BATCH, COALESCE_MAX_WAIT_MS / 1000) if NORMALISE_COALESCE else None
+
+BATCH_FILL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0)
+
+
+class CoalesceCollector(Collector):
+    """Request sharing and micro-batch sizes of the /normalise coalescer."""
+
+    def collect(self):
+        coalescer = COALESCER
+        if coalescer is None:
+            return
+        stats = coalescer.stats
+        yield CounterMetricFamily("normalise_coalesce_requests", "/normalise calls that missed the cache",
+                                  value=stats["requests"])
+        yield CounterMetricFamily("normalise_coalesce_shared", "Calls that joined a computation in flight",
+                                  value=stats["shared"])
+        yield CounterMetricFamily("normalise_coalesce_computed", "Titles normalised by the coalescer",
+                                  value=stats["computed"])
+        yield GaugeMetricFamily("normalise_coalesce_ratio", "Calls per title computation since startup",
+                                value=stats["requests"] / stats["computed"] if stats["computed"] else 1.0)
+        flushes = CounterMetricFamily("normalise_coalesce_batches", "Micro-batches dispatched, by trigger",
+                                      labels=["reason"])
+        for reason, count in stats["flushes"].items():
+            flushes.add_metric([reason], count)
+        yield flushes
+        sizes = list(stats["batch_sizes"])
+        size_bounds = [b for b in (1, 2, 4, 8, 16, 32, 64, 128, 256) if b < coalescer.max_batch]
+        yield _batch_histogram("normalise_coalesce_batch_size", "Titles per micro-batch",
+                               sizes, size_bounds + [coalescer.max_batch], 1)
+        yield _batch_histogram("normalise_coalesce_batch_fill",
+                               "Micro-batch size as a fraction of COALESCE_MAX_BATCH",
+                               sizes, BATCH_FILL_BUCKETS, coalescer.max_batch)
+
+
+def _batch_histogram(name, documentation, sizes, bounds, scale):
+    """Histogram of batch size / scale from counts of batches per size."""
+    buckets = [(str(bound), sum(count for n, count in enumerate(sizes) if n / scale <= bound))
+               for bound in bounds]
+    buckets.append(("+Inf", sum(sizes)))
+    total = sum(n * count for n, count in enumerate(sizes)) / scale
+    return HistogramMetricFamily(name, documentation, buckets=buckets, sum_value=total)
+
+
+_register_process_collector(CoalesceCollector())
+
+
+ADMISSION = (AdmissionController(ADMISSION_MAX_TITLES, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT_SECONDS)
+             if ADMISSION_MAX_TITLES > 0 else None)
+BATCH_THREAD_LIMITER = anyio.CapacityLimiter(BATCH_THREADS)
+
+
+class AdmissionCollector(Collector):
+    """Budget use, queue and rejections of /normalise-batch admission control."""
+
+    def collect(self):
+        admission = ADMISSION
+        if admission is None:
+            return
+        yield GaugeMetricFamily("normalise_admission_queue_depth", "Batch requests waiting for admission",
+                                value=admission.queue_depth)
+        yield GaugeMetricFamily("normalise_admission_queued_titles", "Titles in batch requests waiting",
+                                value=admission.queued_titles)
+        yield GaugeMetricFamily("normalise_admission_in_flight_titles", "Titles charged to admitted batches",
+                                value=admission.in_flight)
+        yield GaugeMetricFamily("normalise_admission_max_titles", "Titles that may be in flight at once",
+                                value=admission.max_titles)
+        yield CounterMetricFamily("normalise_admission_admitted", "Batch requests admitted",
+                                  value=admission.admitted)
+        rejected = CounterMetricFamily("normalise_admission_rejected", "Batch requests refused, by reason",
+                                       labels=["reason"])
+        for reason, count in admission.rejected.items():
+            rejected.add_metric([reason], count)
+        yield rejected
+
+
+_register_process_collector(AdmissionCollector())
+
+ADMISSION_WAIT = Histogram(
+    "normalise_admission_wait_seconds",
+    "Time admitted /normalise-batch requests spent queued",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    registry=PROM_REGISTRY,
+)
+
+
+# How each worker's gauge snapshots combine (default: summed)
+SNAPSHOT_GAUGE_MODES = {
+    "normaliser_rule_pack_info": "pid",  # shows workers running different packs
+    "normaliser_rule_pack_compile_seconds": "max",
+    "normaliser_rule_pack_rules": "max",
+    "normaliser_rule_pack_loaded_timestamp_seconds": "max",
+    "normalise_index_entries": "max",
+    "normalise_index_active": "min",
+    "normalise_catalogue_size": "max",
+    "normalise_coalesce_ratio": "pid",
+}
+
+if MULTIPROC_DIR:
+    MULTIPROC_REGISTRY = CollectorRegistry()
+    MultiProcessCollector(MULTIPROC_REGISTRY, path=MULTIPROC_DIR)
+    MULTIPROC_REGISTRY.register(SnapshotCollector(MULTIPROC_DIR, SNAPSHOT_GAUGE_MODES))
+
+
+async def _write_snapshots(directory: str, interval: float):
+    while True:
+        try:
+            write_snapshot(PROCESS_COLLECTORS, directory)
+        except OSError as e:
+            # Keep going: the next write may succeed, and a scrape writes one too
+            logger.error("could not write metrics snapshot: %s", e)
+        await asyncio.sleep(interval)
+
+
+async def _watch_rule_pack(path: str, interval: float):
+    def mtime():
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    last = mtime()
+    while True:
+        await asyncio.sleep(interval)
+        current = mtime()
+        if current is None or current == last:
+            continue
+        last = current
+        try:
+            # Compile off the event loop; requests keep using the old engine meanwhile
+            _activate(await run_in_threadpool(load_rule_pack, path))
+        except (OSError, ValueError) as e:
+            RULE_PACK_STATS.load_failures += 1
+            logger.error("keeping rule pack %s: %s", get_engine().pack_version, e)
+
+
+class JobQueueCollector(Collector):
+    """Bulk jobs waiting for and holding a worker, read at scrape time."""
+
+    def collect(self):
+        counts = JOBS.counts()
+        yield GaugeMetricFamily("normalise_jobs_queued", "Bulk jobs waiting for a worker", value=counts["queued"])
+        yield GaugeMetricFamily("normalise_jobs_running", "Bulk jobs being normalised", value=counts["running"])
+
+
+_register_process_collector(JobQueueCollector())
+
+JOBS_FINISHED = Counter(
+    "normalise_jobs_finished_total",
+    "Bulk jobs finished, by outcome",
+    ["status"],
+    registry=PROM_REGISTRY,
+)
+
+JOB_ROWS = Counter("normalise_job_rows_total", "Result rows written by bulk jobs", registry=PROM_REGISTRY)
+
+JOB_DURATION = Histogram(
+    "normalise_job_duration_seconds",
+    "Time from a bulk job starting to finishing",
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600),
+    registry=PROM_REGISTRY,
+)
+
+JOB_ROWS_PER_SECOND = Histogram(
+    "normalise_job_rows_per_second",
+    "Throughput of each finished bulk job",
+    buckets=(1000, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000),
+    registry=PROM_REGISTRY,
+)
+
+
+def _observe_job(job):
+    JOBS_FINISHED.labels(status=job.status).inc()
+    JOB_ROWS.inc(job.rows)
+    duration = job.duration_seconds
+    if duration:
+        JOB_DURATION.observe(duration)
+        JOB_ROWS_PER_SECOND.observe(job.rows / duration)
+
 
-    start = time.perf_counter()
-    response = await call_next(request)
-    duration = time.perf_counter() - start
-    status_code = str(response.status_code)
-    REQUEST_COUNTER.labels(method=method, path=path, status=status_code).inc()
-    REQUEST_LATENCY.labels(method=method, path=path, status=status_code).observe(duration)
-    return response
+JOBS = JobManager(
+    JOB_SPOOL_DIR,
+    workers=JOB_WORKERS,
+    chunk_size=JOB_CHUNK_SIZE,
+    max_queued=JOB_MAX_QUEUED,
+    retention_seconds=JOB_RETENTION_SECONDS,
+    normalise=normalise_title,
+    on_finish=_observe_job,
+)
+
+BATCH_SIZE = None
+
+if NORMALISER_METRICS:
+    NORMALISER_STATS = NormaliserStats()
+    _register_process_collector(NORMALISER_STATS)
+
+    RULE_DURATION = Summary(
+        "normaliser_rule_duration_seconds",
+        "Time one title spent in each rule's anchored matcher in the engine, over all passes (sampled)",
+        ["rule"],
+        registry=PROM_REGISTRY,
+    )
+
+    BATCH_SIZE = Histogram(
+        "normalise_batch_size",
+        "Titles per /normalise-batch request",
+        buckets=(1, 10, 100, 1000, 5000, 10000, 50000, 100000),
+        registry=PROM_REGISTRY,
+    )
+
+    def _sample_rule_timings():
+        return random.random() < RULE_TIMING_SAMPLE_RATE
+
+    def _observe_normalisation(engine, messy_title, trace, timings):
+        NORMALISER_STATS.record(trace)
+        if timings:
+            for index, seconds in timings.items():
+                RULE_DURATION.labels(rule=str(index)).observe(seconds)
+
+    set_observer(_observe_normalisation, _sample_rule_timings)
+
+
+app.add_middleware(MetricsMiddleware, counter=REQUEST_COUNTER, latency=REQUEST_LATENCY)
+app.add_middleware(
+    ContentEncodingMiddleware,
+    max_body_bytes=MAX_DECOMPRESSED_BODY_BYTES,
+    max_stream_bytes=MAX_DECOMPRESSED_STREAM_BYTES,
+    stream_paths=("/normalise-stream", "/jobs"),
+    minimum_size=COMPRESS_MIN_BYTES,
+)
 
 
 class SingleTitleRequest(BaseModel):
@@ -58,24 +603,316 @@ class BatchTitleRequest(BaseModel):
 
 
 @app.post("/normalise")
-def normalise_single(request: SingleTitleRequest):
+async def normalise_single(request: SingleTitleRequest):
     try:
-        clean_title = normalise_title(request.messy_title)
+        coalescer = COALESCER
+        if coalescer is None:
+            clean_title = await run_in_threadpool(normalise_title, request.messy_title)
+        else:
+            # Cache hits are answered here: batching them would only add latency
+            clean_title = cached_title(request.messy_title)
+            if clean_title is None:
+                clean_title = await coalescer.submit((get_engine().version, request.messy_title))
         return {"clean_title": clean_title}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/normalise-batch")
-def normalise_batch(request: BatchTitleRequest):
+def _normalise_batch_local(titles: List[str]) -> List[str]:
+    lookup = {t: normalise_title(t) for t in dict.fromkeys(titles)}
+    return [lookup[t] for t in titles]
+
+
+async def _normalise_unique_in_pool(pool: ProcessPoolExecutor, unique: List[str]) -> Dict[str, str]:
+    loop = asyncio.get_running_loop()
+    size = -(-len(unique) // BATCH_PROCESS_WORKERS)
+    chunks = [unique[i:i + size] for i in range(0, len(unique), size)]
+    spec = get_engine().spec()
+    results = await asyncio.gather(*(loop.run_in_executor(pool, normalise_many, c, spec) for c in chunks))
+    lookup = {}
+    for chunk, clean in zip(chunks, results):
+        lookup.update(zip(chunk, clean))
+    return lookup
+
+
+async def _normalise_batch(titles: List[str]) -> dict:
     try:
-        clean_titles = [normalise_title(t) for t in request.messy_titles]
+        if BATCH_SIZE is not None:
+            BATCH_SIZE.observe(len(titles))
+        pool = getattr(app.state, "batch_pool", None)
+        if pool is not None and len(titles) > BATCH_PROCESS_THRESHOLD:
+            unique = list(dict.fromkeys(titles))
+            if len(unique) > BATCH_PROCESS_THRESHOLD:
+                lookup = await _normalise_unique_in_pool(pool, unique)
+                return {"clean_titles": [lookup[t] for t in titles]}
+        limiter = BATCH_THREAD_LIMITER if ADMISSION is not None else None
+        clean_titles = await anyio.to_thread.run_sync(_normalise_batch_local, titles, limiter=limiter)
         return {"clean_titles": clean_titles}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _is_json_content_type(content_type) -> bool:
+    """Whether FastAPI would parse a body with this Content-Type as JSON (missing counts as JSON)."""
+    if not content_type:
+        return True
+    message = email.message.Message()
+    message["content-type"] = content_type
+    subtype = message.get_content_subtype()
+    return message.get_content_maintype() == "application" and (subtype == "json" or subtype.endswith("+json"))
+
+
+async def _read_batch(request: Request) -> List[str]:
+    """Read and validate a BatchTitleRequest body, reporting errors as FastAPI would."""
+    body = await request.body()
+    if not body:
+        raise RequestValidationError([{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}])
+    try:
+        if _is_json_content_type(request.headers.get("content-type")):
+            return BatchTitleRequest.model_validate_json(body).messy_titles
+        # Any other content type reaches the model as raw bytes and is rejected there
+        return BatchTitleRequest.model_validate(body, from_attributes=True).messy_titles
+    except ValidationError as e:
+        errors = [{**error, "loc": ("body",) + tuple(error["loc"])} for error in e.errors(include_url=False)]
+        raise RequestValidationError(errors, body=body)
+
+
+# The body is read by the endpoint itself, after the admission queue check
+_BATCH_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": {"$ref": "#/components/schemas/BatchTitleRequest"}}},
+    }
+}
+
+
+@app.post("/normalise-batch", openapi_extra=_BATCH_REQUEST_BODY)
+async def normalise_batch(request: Request):
+    admission = ADMISSION
+    if admission is None:
+        return await _normalise_batch(await _read_batch(request))
+    try:
+        # Shed load before paying to upload, parse and validate the body
+        admission.check_queue()
+        titles = await _read_batch(request)
+        async with admission.admit(len(titles)) as waited:
+            ADMISSION_WAIT.observe(waited)
+            return await _normalise_batch(titles)
+    except Rejected as e:
+        detail = "batch queue is full" if e.reason == "queue_full" else "timed out waiting for batch capacity"
+        raise HTTPException(status_code=e.status_code, detail=detail,
+                            headers={"Retry-After": str(e.retry_after)})
+
+
+class RequestStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body is produced while the request is still being read.
+
+    The stock implementation reads `receive` in a second task to watch for
+    disconnects, which would swallow request body chunks meant for the
+    generator. Here the generator's own reads of the request body notice a
+    disconnect instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def _request_is_ndjson(request: Request) -> bool:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    return content_type in NDJSON_CONTENT_TYPES
+
+
+@app.post("/normalise-stream")
+async def normalise_stream(request: Request):
+    """Normalise a newline-delimited body (plain titles or NDJSON) as it arrives.
+
+    Results are streamed back as NDJSON, one `{"clean_title": ...}` line per
+    input line and in the same order, so memory use does not grow with the
+    length of the stream.
+    """
+    ndjson = _request_is_ndjson(request)
+
+    async def results():
+        line_no = 1
+        try:
+            async for lines in iter_line_chunks(request.stream()):
+                yield await run_in_threadpool(render_results, lines, ndjson, line_no, normalise_title)
+                line_no += len(lines)
+        except LineTooLong as e:
+            yield (json.dumps({"line": e.line, "error": str(e)}) + "\n").encode("utf-8")
+        except StarletteHTTPException as e:
+            # A compressed body turned out corrupt or too large after streaming began
+            yield (json.dumps({"line": line_no, "error": e.detail}) + "\n").encode("utf-8")
+        except ClientDisconnect:
+            return  # nobody is left to read the rest
+
+    return RequestStreamingResponse(results(), media_type="application/x-ndjson")
+
+
+def _require_single_worker():
+    if SERVE_WORKERS > 1:
+        raise HTTPException(
+            status_code=409,
+            detail=f"not available with {SERVE_WORKERS} workers: state would only reach one of them",
+        )
+
+
+def _get_job(job_id: str):
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+
+@app.post("/jobs", status_code=202, dependencies=[Depends(_require_single_worker)])
+async def submit_job(request: Request, response: Response):
+    """Spool a newline-delimited body (as for /normalise-stream) and queue it as a job."""
+    try:
+        job = await JOBS.submit(request.stream(), _request_is_ndjson(request))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except LineTooLong as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientDisconnect:
+        # The upload was aborted and its spool file removed; the reply goes nowhere
+        return Response(status_code=499)
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job.info()
+
+
+@app.get("/jobs/{job_id}", dependencies=[Depends(_require_single_worker)])
+def job_status(job_id: str):
+    return _get_job(job_id).info()
+
+
+@app.get("/jobs/{job_id}/results", dependencies=[Depends(_require_single_worker)])
+def job_results(job_id: str, offset: int = Query(0, ge=0), limit: int = Query(1000, ge=1, le=10000)):
+    """One page of results; rows already written are readable while the job runs."""
+    job = _get_job(job_id)
+    status = job.status  # read before the rows, so `done` guarantees the page is final
+    rows = [json.loads(line) for line in JOBS.read_rows(job, offset, limit)]
+    next_offset = offset + len(rows)
+    if status in FINISHED and next_offset >= job.rows:
+        next_offset = None
+    return {"job_id": job.id, "status": status, "offset": offset, "results": rows, "next_offset": next_offset}
+
+
+@app.get("/jobs/{job_id}/results/stream", dependencies=[Depends(_require_single_worker)])
+def job_results_stream(job_id: str):
+    """All results as NDJSON, following the job until it finishes."""
+    job = _get_job(job_id)
+    return StreamingResponse(JOBS.iter_results(job), media_type="application/x-ndjson")
+
+
+@app.delete("/jobs/{job_id}", status_code=204, dependencies=[Depends(_require_single_worker)])
+def delete_job(job_id: str):
+    """Cancel a queued or running job, or drop a finished one, and delete its files."""
+    if not JOBS.delete(job_id):
+        raise HTTPException(status_code=404, detail="job not found")
+    return Response(status_code=204)
+
+
+def _match_title(messy_title: str) -> dict:
+    clean_title = normalise_title(messy_title)
+    match = CATALOGUE_INDEX.match(clean_title, MATCH_MIN_SCORE)
+    MATCH_SCORE.observe(match["score"] if match else 0.0)
+    return {"clean_title": clean_title, "match": match}
+
+
+def _require_catalogue():
+    if not len(CATALOGUE_INDEX):
+        raise HTTPException(status_code=503, detail="no catalogue loaded (set CATALOGUE)")
+
+
+@app.post("/match", dependencies=[Depends(_require_catalogue)])
+def match_single(request: SingleTitleRequest):
+    """Normalise a title and find its best canonical catalogue entry."""
+    return _match_title(request.messy_title)
+
+
+def _match_batch(titles: List[str]) -> List[dict]:
+    lookup = {t: _match_title(t) for t in dict.fromkeys(titles)}
+    return [lookup[t] for t in titles]
+
+
+@app.post("/match-batch", dependencies=[Depends(_require_catalogue)])
+async def match_batch(request: BatchTitleRequest):
+    return {"matches": await run_in_threadpool(_match_batch, request.messy_titles)}
+
+
+class CatalogueEntry(BaseModel):
+    id: str
+    title: str
+
+
+class CatalogueInsert(BaseModel):
+    entries: List[CatalogueEntry]
+
+
+def require_admin(authorization: str = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="admin API disabled (ADMIN_TOKEN not set)")
+    # Compared as bytes: compare_digest refuses str with non-ASCII characters.
+    # Header values arrive decoded as latin-1, which gives back the raw bytes.
+    expected = f"Bearer {ADMIN_TOKEN}".encode("utf-8")
+    if not authorization or not secrets.compare_digest(authorization.encode("latin-1"), expected):
+        raise HTTPException(status_code=401, detail="invalid admin token")
+
+
+def _rule_pack_info(engine) -> dict:
+    return {
+        "version": engine.pack_version,
+        "hash": engine.version,
+        "rules": len(engine.rules),
+        "compile_seconds": engine.compile_seconds,
+    }
+
+
+@app.get("/admin/rules", dependencies=[Depends(require_admin)])
+def active_rule_pack():
+    return _rule_pack_info(get_engine())
+
+
+@app.put("/admin/rules", dependencies=[Depends(require_admin), Depends(_require_single_worker)])
+async def upload_rule_pack(request: Request):
+    """Validate, compile and atomically activate the rule pack in the request body."""
+    try:
+        data = json.loads(await request.body())
+        engine = await run_in_threadpool(parse_rule_pack, data)
+    except ValueError as e:
+        RULE_PACK_STATS.load_failures += 1
+        raise HTTPException(status_code=400, detail=str(e))
+    return _rule_pack_info(_activate(engine))
+
+
+@app.post("/admin/rules/reload", dependencies=[Depends(require_admin), Depends(_require_single_worker)])
+async def reload_rule_pack():
+    """Re-read the RULE_PACK file and activate it."""
+    if not RULE_PACK:
+        raise HTTPException(status_code=409, detail="no RULE_PACK file configured")
+    try:
+        engine = await run_in_threadpool(load_rule_pack, RULE_PACK)
+    except (OSError, ValueError) as e:
+        RULE_PACK_STATS.load_failures += 1
+        raise HTTPException(status_code=400, detail=str(e))
+    return _rule_pack_info(_activate(engine))
+
+
+@app.post("/admin/catalogue", dependencies=[Depends(require_admin), Depends(_require_single_worker)])
+def insert_catalogue_entries(request: CatalogueInsert):
+    """Add canonical titles to the match catalogue, replacing entries with the same id."""
+    for entry in request.entries:
+        CATALOGUE_INDEX.add(entry.id, entry.title)
+    return {"inserted": len(request.entries), "size": len(CATALOGUE_INDEX)}
+
+
 @app.get("/metrics")
 def metrics() -> Response:
-    data = generate_latest(PROM_REGISTRY)
+    if MULTIPROC_DIR:
+        write_snapshot(PROCESS_COLLECTORS, MULTIPROC_DIR)
+        data = generate_latest(MULTIPROC_REGISTRY)
+    else:
+        data = generate_latest(PROM_REGISTRY)
     return Response(content=data, media_type=CONTENT_TYPE_LATEST)
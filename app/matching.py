@@ -0,0 +1,145 @@
+"""Match normalised titles against a canonical title catalogue.
+
+Clean titles still differ in punctuation and spelling ("COLIN & JUSTIN'S
+HOME HEIST" vs "COLIN AND JUSTINS HOME HEIST"). Both sides are reduced to a
+match key (accents folded, `&` spelled out, apostrophes dropped, other
+punctuation collapsed to spaces), then compared by trigram similarity.
+
+`CatalogueIndex` keeps an inverted index from trigram to catalogue entries,
+so a lookup only touches entries sharing a trigram with the query. Query
+trigrams are visited rarest first and scanning stops once `max_postings`
+entries have been counted, so common trigrams (e.g. " TH"), which carry
+little signal, do not make lookups grow with the catalogue. The best
+candidates by shared-trigram count are re-scored with the exact Dice
+coefficient over all trigrams.
+
+The catalogue is a CSV file with `id` and `title` columns:
+
+    id,title
+    tt0001,COLIN AND JUSTIN'S HOME HEIST
+"""
+import csv
+import heapq
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional
+
+_NON_ALNUM = re.compile(r"[^0-9A-Z]+")
+
+# Postings counted per lookup before the remaining, commoner trigrams are skipped
+MAX_POSTINGS = 5000
+# Rarest trigrams always counted, however common, so every query finds candidates
+MIN_QUERY_GRAMS = 3
+# Candidates re-scored exactly, by shared-trigram count
+RESCORE_CANDIDATES = 20
+
+
+def match_key(title: str) -> str:
+    """Reduce a clean title to the form compared against the catalogue."""
+    text = unicodedata.normalize("NFKD", title.upper())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.replace("&", " AND ").replace("'", "").replace("’", "")
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def trigrams(key: str) -> frozenset:
+    padded = f" {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def dice(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+class CatalogueIndex:
+    """Trigram inverted index over (canonical id, title) entries, with incremental inserts.
+
+    Inserts and lookups may run concurrently: inserts take a lock, lookups
+    only read lists that are appended to.
+    """
+
+    def __init__(self, max_postings: int = MAX_POSTINGS):
+        self.max_postings = max_postings
+        self.ids: List[str] = []
+        self.titles: List[str] = []
+        self.keys: List[str] = []
+        self.live: List[bool] = []       # False once an id is re-inserted with a new title
+        self._by_id: Dict[str, int] = {}
+        self._exact: Dict[str, int] = {}  # match key -> newest live entry
+        self._postings: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def add(self, canonical_id: str, title: str) -> None:
+        """Insert an entry, replacing any earlier entry with the same id."""
+        key = match_key(title)
+        with self._lock:
+            old = self._by_id.get(canonical_id)
+            if old is not None:
+                if self.titles[old] == title:
+                    return
+                self.live[old] = False
+                if self._exact.get(self.keys[old]) == old:
+                    del self._exact[self.keys[old]]
+            doc = len(self.ids)
+            self.ids.append(canonical_id)
+            self.titles.append(title)
+            self.keys.append(key)
+            self.live.append(True)
+            self._by_id[canonical_id] = doc
+            self._exact[key] = doc
+            for gram in trigrams(key):
+                self._postings.setdefault(gram, []).append(doc)
+
+    def match(self, clean_title: str, min_score: float = 0.0) -> Optional[dict]:
+        """Best catalogue entry for a clean title, or None if nothing scores at least `min_score`."""
+        key = match_key(clean_title)
+        doc = self._exact.get(key)
+        if doc is not None:
+            return self._result(doc, 1.0)
+
+        query = trigrams(key)
+        postings = sorted((self._postings.get(g, ()) for g in query), key=len)
+        counts = Counter()
+        scanned = 0
+        for i, docs in enumerate(postings):
+            scanned += len(docs)
+            if i >= MIN_QUERY_GRAMS and scanned > self.max_postings:
+                break
+            counts.update(docs)
+
+        best, best_score = None, -1.0
+        for d in heapq.nlargest(RESCORE_CANDIDATES, counts, key=counts.__getitem__):
+            if not self.live[d]:
+                continue
+            score = dice(query, trigrams(self.keys[d]))
+            if score > best_score:
+                best, best_score = d, score
+        if best is None or best_score < min_score:
+            return None
+        return self._result(best, best_score)
+
+    def _result(self, doc: int, score: float) -> dict:
+        return {"canonical_id": self.ids[doc], "canonical_title": self.titles[doc], "score": round(score, 4)}
+
+
+def load_catalogue(path, index: CatalogueIndex = None) -> CatalogueIndex:
+    """Read a CSV catalogue with `id` and `title` columns into `index` (or a new one).
+
+    Raises OSError or ValueError.
+    """
+    index = index if index is not None else CatalogueIndex()
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames or not {"id", "title"} <= set(reader.fieldnames):
+            raise ValueError(f"{path}: catalogue needs 'id' and 'title' columns")
+        for row in reader:
+            if row["id"] and row["title"]:
+                index.add(row["id"], row["title"])
+    return index
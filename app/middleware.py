@@ -0,0 +1,183 @@
+import time
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.exceptions import HTTPException
+from starlette.responses import PlainTextResponse
+
+from app.compression import DECODERS, ENCODERS, DecompressionError, choose_encoding
+
+UNMATCHED_PATH = "unmatched"
+
+KNOWN_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+
+class MetricsMiddleware:
+    """Raw ASGI middleware recording request count and latency per route.
+
+    Requests are labelled with the matched route's path template (e.g.
+    `/normalise`), never the raw URL, so probes for random URLs all land in a
+    single `unmatched` series and label cardinality stays bounded. Unknown
+    methods are folded into `OTHER` for the same reason. The labelled metric
+    children are cached so the hot path is a dict lookup.
+    """
+
+    def __init__(self, app, counter, latency, skip_paths=("/metrics",)):
+        self.app = app
+        self.counter = counter
+        self.latency = latency
+        self.skip_paths = frozenset(skip_paths)
+        self._children = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            route = scope.get("route")
+            path = getattr(route, "path", None) or UNMATCHED_PATH
+            method = scope["method"] if scope["method"] in KNOWN_METHODS else "OTHER"
+            key = (method, path, status_code)
+            children = self._children.get(key)
+            if children is None:
+                labels = {"method": method, "path": path, "status": str(status_code)}
+                children = self._children[key] = (
+                    self.counter.labels(**labels),
+                    self.latency.labels(**labels),
+                )
+            children[0].inc()
+            children[1].observe(duration)
+
+
+class ContentEncodingMiddleware:
+    """Raw ASGI middleware decoding compressed request bodies and compressing replies.
+
+    Requests with `Content-Encoding: gzip` (or `zstd`, when available) are
+    decompressed incrementally as the app reads them; once more than
+    `max_body_bytes` have come out (`max_stream_bytes` for `stream_paths`,
+    whose bodies are never held in memory) reading fails with 413, and corrupt
+    data fails with 400. Unsupported encodings get 415 up front.
+
+    Responses are compressed with the best encoding in `Accept-Encoding` when
+    they are streamed or at least `minimum_size` bytes. Streamed chunks are
+    flushed one by one, so NDJSON results still arrive as they are produced.
+    """
+
+    def __init__(self, app, max_body_bytes, max_stream_bytes=None, stream_paths=(),
+                 minimum_size=1024, gzip_level=3, zstd_level=3):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.max_stream_bytes = max_body_bytes if max_stream_bytes is None else max_stream_bytes
+        self.stream_paths = frozenset(stream_paths)
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "zstd": zstd_level}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        content_encoding = headers.get("content-encoding", "identity").strip().lower()
+        if content_encoding != "identity":
+            decoder_cls = DECODERS.get(content_encoding)
+            if decoder_cls is None:
+                response = PlainTextResponse(f"unsupported Content-Encoding: {content_encoding}", status_code=415)
+                await response(scope, receive, send)
+                return
+            limit = self.max_stream_bytes if scope["path"] in self.stream_paths else self.max_body_bytes
+            receive = _DecodingReceive(receive, decoder_cls(), limit)
+            scope = dict(scope)
+            scope["headers"] = [(k, v) for k, v in scope["headers"]
+                                if k not in (b"content-encoding", b"content-length")]
+
+        encoding = choose_encoding(headers.get("accept-encoding", ""))
+        if encoding is not None:
+            send = _EncodingSend(send, encoding, self.levels[encoding], self.minimum_size)
+        await self.app(scope, receive, send)
+
+
+class _DecodingReceive:
+    def __init__(self, receive, decoder, limit):
+        self.receive = receive
+        self.decoder = decoder
+        self.limit = limit
+        self.total = 0
+        self.pieces = None  # iterator over the decoded pieces of the current message
+        self.done = False
+
+    async def __call__(self):
+        while True:
+            if self.pieces is not None:
+                try:
+                    piece = next(self.pieces, None)
+                except DecompressionError as e:
+                    raise HTTPException(status_code=400, detail=str(e)) from None
+                if piece is not None:
+                    self.total += len(piece)
+                    if self.total > self.limit:
+                        raise HTTPException(status_code=413,
+                                            detail=f"decompressed body exceeds {self.limit} bytes")
+                    return {"type": "http.request", "body": piece, "more_body": True}
+                self.pieces = None
+                if self.done:
+                    try:
+                        self.decoder.finish()
+                    except DecompressionError as e:
+                        raise HTTPException(status_code=400, detail=str(e)) from None
+                    return {"type": "http.request", "body": b"", "more_body": False}
+            message = await self.receive()
+            if message["type"] != "http.request":
+                return message
+            self.done = not message.get("more_body", False)
+            self.pieces = self.decoder.decompress(message.get("body", b""))
+
+
+class _EncodingSend:
+    def __init__(self, send, encoding, level, minimum_size):
+        self.send = send
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.start = None
+        self.encoder = None
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows whether to compress
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=list(start["headers"]))
+            if "content-encoding" not in headers and (more_body or len(body) >= self.minimum_size):
+                self.encoder = ENCODERS[self.encoding](self.level)
+                headers["Content-Encoding"] = self.encoding
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                headers.add_vary_header("Accept-Encoding")
+                start = {**start, "headers": headers.raw}
+            await self.send(start)
+        if self.encoder is None:
+            await self.send(message)
+            return
+        await self.send({"type": "http.response.body", "body": self.encoder.compress(body, not more_body),
+                         "more_body": more_body})
@@ -1,4 +1,15 @@
+import hashlib
+import os
 import re
+import time
+
+from app.cache import LRUCache
+
+try:
+    from re import _constants as _sre_constants, _parser as _sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants as _sre_constants
+    import sre_parse as _sre_parse
 
 RULES = [
     re.compile(r" (S\d+ D\d+|S\d+|D\d+)( RAIN DEL)?$"),
@@ -18,17 +29,538 @@ RULES = [
 ]
 
 
-def normalise_title(messy_title: str) -> str:
-    """Recursively apply regex rules to clean a TV title."""
-    clean_title = messy_title
-    original_title = clean_title
+# ---------------------------
+# Rule compiler
+# ---------------------------
+# Every rule is anchored at one end of the title. Suffix rules (`...$`) are
+# rewritten as patterns over the *reversed* title so they can be matched with
+# `Pattern.match` at the current end instead of being searched for across the
+# whole string; prefix rules (`^...`) are matched in place at the current start.
+
+_c = _sre_constants
+
+_CATEGORIES = {
+    _c.CATEGORY_DIGIT: r"\d",
+    _c.CATEGORY_NOT_DIGIT: r"\D",
+    _c.CATEGORY_SPACE: r"\s",
+    _c.CATEGORY_NOT_SPACE: r"\S",
+    _c.CATEGORY_WORD: r"\w",
+    _c.CATEGORY_NOT_WORD: r"\W",
+}
+
+
+def _emit_class_item(op, av) -> str:
+    if op == _c.LITERAL:
+        return re.escape(chr(av))
+    if op == _c.RANGE:
+        return "%s-%s" % (re.escape(chr(av[0])), re.escape(chr(av[1])))
+    if op == _c.NEGATE:
+        return "^"
+    if op == _c.CATEGORY and av in _CATEGORIES:
+        return _CATEGORIES[av]
+    raise ValueError("unsupported character class item: %s" % op)
+
+
+def _emit(items, reverse: bool) -> str:
+    """Render a parsed (sub)pattern back to regex source, optionally reversed."""
+    parts = [_emit_item(op, av, reverse) for op, av in items]
+    if reverse:
+        parts.reverse()
+    return "".join(parts)
+
+
+def _emit_item(op, av, reverse: bool) -> str:
+    if op == _c.LITERAL:
+        return re.escape(chr(av))
+    if op == _c.NOT_LITERAL:
+        return "[^%s]" % re.escape(chr(av))
+    if op == _c.ANY:
+        return "."
+    if op == _c.IN:
+        return "[%s]" % "".join(_emit_class_item(o, a) for o, a in av)
+    if op in (_c.MAX_REPEAT, _c.MIN_REPEAT):
+        lo, hi, sub = av
+        quantifier = "{%d,%s}" % (lo, "" if hi == _c.MAXREPEAT else hi)
+        if op == _c.MIN_REPEAT:
+            quantifier += "?"
+        return "(?:%s)%s" % (_emit(sub, reverse), quantifier)
+    if op == _c.SUBPATTERN:
+        _group, add_flags, del_flags, sub = av
+        if add_flags or del_flags:
+            raise ValueError("inline flags are not supported inside rules")
+        return "(?:%s)" % _emit(sub, reverse)
+    if op == _c.BRANCH:
+        return "(?:%s)" % "|".join(_emit(branch, reverse) for branch in av[1])
+    raise ValueError("unsupported regex construct: %s" % op)
+
+
+def _split_anchor(rule: re.Pattern):
+    """Return ("suffix" | "prefix", unanchored body) for a rule, or raise ValueError."""
+    parsed = _sre_parse.parse(rule.pattern, rule.flags)
+    items = list(parsed)
+    if parsed.getwidth()[0] == 0:
+        raise ValueError("rule %r can match the empty string" % rule.pattern)
+
+    def is_at(item, where):
+        return item[0] == _c.AT and item[1] == where
+
+    starts = bool(items) and is_at(items[0], _c.AT_BEGINNING)
+    ends = bool(items) and is_at(items[-1], _c.AT_END)
+    if starts == ends:
+        raise ValueError("rule %r must be anchored at exactly one end" % rule.pattern)
+    return ("prefix", items[1:]) if starts else ("suffix", items[:-1])
+
+
+# ---------------------------
+# Reversed-match safety
+# ---------------------------
+# `rule.sub` removes the leftmost, i.e. longest, suffix that a `...$` rule
+# matches. Matching the reversed body at the end of the title instead returns
+# the first match in backtracking order, which is only the longest one for
+# some rule shapes: `( B| A B)$` on "C A B" stops after " B". The check below
+# decides this exactly for the regular constructs `_emit` supports, by running
+# the reversed body as a priority-ordered NFA (how backtracking picks its
+# match, as in RE2's leftmost-first mode) next to a plain NFA (every match)
+# over every reachable configuration. Rules that fail it are searched for
+# like `rule.sub` does.
+
+# Bodies beyond these are not analysed but treated as unsafe, which is only slower
+_MAX_UNROLL = 64  # counted repeat size
+_MAX_STATES = 400  # NFA states
+_MAX_CONFIGS = 5000  # NFA configurations explored
+
+
+def _build_nfa(items, reverse: bool, flags: int):
+    """Priority-ordered NFA for a parsed body read back to front (reverse=True) or front to back.
+
+    States are ("char", test, next), ("split", [next, ...] in priority order)
+    or ("match",); the start state's index is returned with the state list.
+    """
+    states = [("match",)]
+
+    def add(state) -> int:
+        states.append(state)
+        return len(states) - 1
+
+    def seq(items, cont: int) -> int:
+        for op, av in (items if reverse else reversed(items)):
+            cont = item(op, av, cont)
+        return cont
+
+    def item(op, av, cont: int) -> int:
+        if op in (_c.LITERAL, _c.NOT_LITERAL, _c.ANY, _c.IN):
+            return add(("char", re.compile(_emit_item(op, av, False), flags).match, cont))
+        if op == _c.SUBPATTERN:
+            return seq(av[3], cont)
+        if op == _c.BRANCH:
+            return add(("split", [seq(branch, cont) for branch in av[1]]))
+        if op in (_c.MAX_REPEAT, _c.MIN_REPEAT):
+            lo, hi, sub = av
+            greedy = op == _c.MAX_REPEAT
+            if lo > _MAX_UNROLL or (hi != _c.MAXREPEAT and hi - lo > _MAX_UNROLL):
+                raise ValueError("repeat too large to analyse")
+            if hi == _c.MAXREPEAT:
+                loop = add(("split", []))
+                body = seq(sub, loop)
+                states[loop][1].extend([body, cont] if greedy else [cont, body])
+                tail = loop
+            else:
+                tail = cont
+                for _ in range(hi - lo):
+                    body = seq(sub, tail)
+                    tail = add(("split", [body, cont] if greedy else [cont, body]))
+            for _ in range(lo):
+                tail = seq(sub, tail)
+            return tail
+        raise ValueError("unsupported regex construct: %s" % op)
+
+    return seq(items, 0), states
+
+
+def _sample_chars(items) -> set:
+    """Characters covering every class the body's character tests can tell apart."""
+    chars = set("05a_Zz \t\u00a0\u0663\u00e9-.(\x00~\uffff")
+
+    def walk(items):
+        for op, av in items:
+            if op in (_c.LITERAL, _c.NOT_LITERAL):
+                chars.add(chr(av))
+            elif op == _c.IN:
+                for o, a in av:
+                    if o in (_c.LITERAL, _c.NOT_LITERAL):
+                        chars.add(chr(a))
+                    elif o == _c.RANGE:
+                        for code in (a[0] - 1, a[0], a[1], a[1] + 1):
+                            if 0 <= code <= 0x10FFFF:
+                                chars.add(chr(code))
+            elif op == _c.SUBPATTERN:
+                walk(av[3])
+            elif op == _c.BRANCH:
+                for branch in av[1]:
+                    walk(branch)
+            elif op in (_c.MAX_REPEAT, _c.MIN_REPEAT):
+                walk(av[2])
+
+    walk(items)
+    return chars | {c.upper() for c in chars if len(c.upper()) == 1} | \
+        {c.lower() for c in chars if len(c.lower()) == 1}
+
+
+def _first_match_is_longest(body, flags: int) -> bool:
+    """True if matching the reversed body always yields the longest match, as `rule.sub` removes."""
+    try:
+        start, states = _build_nfa(body, True, flags)
+    except ValueError:
+        return False
+    if len(states) > _MAX_STATES:
+        return False
+
+    def closure(heads) -> list:
+        out, seen = [], set()
+
+        def visit(s):
+            if s in seen:
+                return
+            seen.add(s)
+            if states[s][0] == "split":
+                for nxt in states[s][1]:
+                    visit(nxt)
+            else:
+                out.append(s)
+
+        for s in heads:
+            visit(s)
+        return out
+
+    chars = sorted(_sample_chars(body))
+    first = tuple(closure([start]))
+    todo = [(first, frozenset(first))]
+    seen = set(todo)
+    while todo:
+        ordered, every = todo.pop()
+        if 0 in every and 0 not in ordered:
+            return False  # a longer match exists here, but backtracking has settled on a shorter one
+        if 0 in ordered:
+            ordered = ordered[:ordered.index(0)]  # lower-priority threads can no longer win
+        for ch in chars:
+            step_ordered = tuple(closure([states[s][2] for s in ordered if states[s][1](ch)]))
+            step_every = frozenset(closure([states[s][2] for s in every if s and states[s][1](ch)]))
+            if not step_every:
+                continue
+            config = (step_ordered, step_every)
+            if config not in seen:
+                if len(seen) >= _MAX_CONFIGS:
+                    return False
+                seen.add(config)
+                todo.append(config)
+    return True
+
+
+class RuleEngine:
+    """Compiled form of a rule list that peels noise off both ends of a title.
+
+    A title is cut down to a `[start, end)` window rather than re-built after
+    every rule. Within a pass, consecutive suffix rules are merged into one
+    alternation over the reversed title so that a single `match` call finds
+    the first remaining rule that applies at the current end. A suffix rule
+    whose reversed match could be shorter than what `rule.sub` removes (see
+    `_first_match_is_longest`) is not merged but searched for in the window.
+    Passes repeat until nothing changes, exactly like applying
+    `rule.sub("", ...)` for every rule in order followed by `strip()`.
+    """
+
+    def __init__(self, rules, pack_version: str = "builtin"):
+        started = time.perf_counter()
+        self.rules = list(rules)
+        # `version` identifies the rules themselves and keys the title cache;
+        # `pack_version` is the human-readable name of the pack they came from.
+        self.version = ruleset_version(self.rules)
+        self.pack_version = pack_version
+        runs = []  # [kind, flags, payload]
+        # One matcher per rule, as the stages apply it: suffix rules over the
+        # reversed title, prefix rules in place, "search" rules as themselves
+        # (for instrumentation)
+        self.rule_matchers = []
+        for rule in self.rules:
+            kind, body = _split_anchor(rule)
+            if kind == "prefix":
+                matcher = re.compile(_emit(body, False), rule.flags)
+                runs.append(["prefix", rule.flags, matcher])
+                self.rule_matchers.append(("prefix", matcher))
+                continue
+            source = _emit(body, True)  # also rejects constructs the engine cannot reverse
+            if not _first_match_is_longest(body, rule.flags):
+                runs.append(["search", rule.flags, rule])
+                self.rule_matchers.append(("search", rule))
+                continue
+            self.rule_matchers.append(("suffix", re.compile(source, rule.flags)))
+            if runs and runs[-1][0] == "suffix" and runs[-1][1] == rule.flags:
+                runs[-1][2].append(source)
+            else:
+                runs.append(["suffix", rule.flags, [source]])
 
-    for rule in RULES:
-        clean_title = rule.sub("", clean_title)
+        self._stages = []
+        first = 0  # index in self.rules of each stage's first rule
+        for kind, flags, payload in runs:
+            size = 1
+            if kind == "suffix":
+                size = len(payload)
+                # payload[k] becomes a matcher that tries rules k, k+1, ... in order
+                payload = [
+                    re.compile("|".join("(?P<r%d>%s)" % (i, src)
+                                        for i, src in enumerate(payload) if i >= k), flags)
+                    for k in range(len(payload))
+                ]
+            self._stages.append((kind, payload, first, size))
+            first += size
+        self.compile_seconds = time.perf_counter() - started
 
-    clean_title = clean_title.strip()
+    def spec(self):
+        """Picklable (version, [(pattern, flags), ...]) description of the rules."""
+        return self.version, [(rule.pattern, rule.flags) for rule in self.rules]
 
-    if clean_title != original_title and clean_title:
-        return normalise_title(clean_title)
+    def normalise(self, title: str, trace: list = None) -> str:
+        """Normalise one title.
 
+        If `trace` is a list, one list per pass is appended to it holding the
+        indices (into `self.rules`) of the rules that matched in that pass.
+        """
+        # `$` also matches before a trailing newline; leave such input to the
+        # plain regex loop rather than model that here.
+        if "\n" in title:
+            return apply_rules(self.rules, title, trace)
+
+        n = len(title)
+        rev = title[::-1]
+        start, end = 0, n
+        while True:
+            prev = (start, end)
+            if trace is not None:
+                trace.append([])
+            for kind, matcher, first, _ in self._stages:
+                if kind == "prefix":
+                    m = matcher.match(title, start, end)
+                    if m:
+                        start = m.end()
+                        if trace is not None:
+                            trace[-1].append(first)
+                    continue
+                if kind == "search":
+                    m = matcher.search(title, start, end)
+                    if m:
+                        end = m.start()
+                        if trace is not None:
+                            trace[-1].append(first)
+                    continue
+                k = 0
+                while k < len(matcher):
+                    m = matcher[k].match(rev, n - end, n - start)
+                    if m is None:
+                        break
+                    end -= m.end() - m.start()
+                    k = int(m.lastgroup[1:]) + 1
+                    if trace is not None:
+                        trace[-1].append(first + k - 1)
+
+            while start < end and title[start].isspace():
+                start += 1
+            while end > start and title[end - 1].isspace():
+                end -= 1
+            if (start, end) == prev or start == end:
+                return title[start:end]
+
+    def normalise_timed(self, title: str, trace: list, timings: dict) -> str:
+        """Like `normalise`, but try each rule with its own matcher and time it.
+
+        Gives the same result and trace as `normalise`. The seconds spent in
+        each rule over all passes are added to `timings`, keyed by rule index;
+        it stays empty for titles left to the plain regex loop. Slower than
+        `normalise`, so only meant for sampled titles.
+        """
+        if "\n" in title:
+            return apply_rules(self.rules, title, trace)
+
+        clock = time.perf_counter
+        matchers = self.rule_matchers
+        n = len(title)
+        rev = title[::-1]
+        start, end = 0, n
+        while True:
+            prev = (start, end)
+            trace.append([])
+            for kind, _, first, size in self._stages:
+                if kind == "prefix":
+                    started = clock()
+                    m = matchers[first][1].match(title, start, end)
+                    timings[first] = timings.get(first, 0.0) + clock() - started
+                    if m:
+                        start = m.end()
+                        trace[-1].append(first)
+                    continue
+                if kind == "search":
+                    started = clock()
+                    m = matchers[first][1].search(title, start, end)
+                    timings[first] = timings.get(first, 0.0) + clock() - started
+                    if m:
+                        end = m.start()
+                        trace[-1].append(first)
+                    continue
+                # What the merged matcher does: the first rule, from k on, that matches at the end
+                k = first
+                while k < first + size:
+                    for index in range(k, first + size):
+                        started = clock()
+                        m = matchers[index][1].match(rev, n - end, n - start)
+                        timings[index] = timings.get(index, 0.0) + clock() - started
+                        if m:
+                            end -= m.end() - m.start()
+                            trace[-1].append(index)
+                            k = index + 1
+                            break
+                    else:
+                        break
+
+            while start < end and title[start].isspace():
+                start += 1
+            while end > start and title[end - 1].isspace():
+                end -= 1
+            if (start, end) == prev or start == end:
+                return title[start:end]
+
+
+def ruleset_version(rules) -> str:
+    """Short content hash identifying a rule list (patterns, flags and order)."""
+    digest = hashlib.sha256()
+    for rule in rules:
+        digest.update(b"%d:%s\n" % (rule.flags, rule.pattern.encode("utf-8")))
+    return digest.hexdigest()[:12]
+
+
+def apply_rules(rules, title: str, trace: list = None) -> str:
+    """Reference implementation: apply every rule in turn until a fixed point."""
+    while True:
+        clean_title = title
+        if trace is not None:
+            trace.append([])
+        for index, rule in enumerate(rules):
+            before = clean_title
+            clean_title = rule.sub("", clean_title)
+            if trace is not None and clean_title != before:
+                trace[-1].append(index)
+        clean_title = clean_title.strip()
+        if clean_title == title or not clean_title:
+            return clean_title
+        title = clean_title
+
+
+_ENGINE = RuleEngine(RULES)
+
+
+def get_engine() -> RuleEngine:
+    """Return the active rule engine."""
+    return _ENGINE
+
+
+def swap_engine(engine: RuleEngine) -> RuleEngine:
+    """Make `engine` the active rule engine and return the previous one.
+
+    The swap is a single reference assignment: calls already running keep
+    the engine they started with, and new calls see the new one.
+    """
+    global _ENGINE
+    previous, _ENGINE = _ENGINE, engine
+    return previous
+
+# Results are keyed by (rule-set version, title) so a different rule set can
+# never be answered from entries computed by another one.
+TITLE_CACHE = LRUCache(int(os.environ.get("TITLE_CACHE_SIZE", "65536")))
+
+# Optional instrumentation hook, called as observer(engine, messy_title, trace,
+# timings) whenever a title is actually normalised (i.e. on a cache miss).
+# When the `sample()` callable given with it returns true the title goes
+# through RuleEngine.normalise_timed and `timings` holds seconds per rule;
+# otherwise it is None. See set_observer().
+_OBSERVER = None
+_SAMPLE = None
+
+
+def set_observer(observer, sample=None) -> None:
+    """Install (or with None, remove) the callback that receives per-title rule traces.
+
+    `sample`, if given, is called before each title is normalised to decide
+    whether to also time every rule for the observer.
+    """
+    global _OBSERVER, _SAMPLE
+    _OBSERVER, _SAMPLE = observer, sample
+
+
+# Optional precomputed title index (see app.lookup), consulted on cache
+# misses only while the rules it was built with are active. See set_title_index().
+_INDEX = None
+
+
+def set_title_index(index) -> None:
+    """Install (or with None, remove) the precomputed messy -> clean title index."""
+    global _INDEX
+    _INDEX = index
+
+
+def get_title_index():
+    return _INDEX
+
+
+def cached_title(messy_title: str):
+    """The cached clean title under the active rules, or None (not counted as a cache miss)."""
+    return TITLE_CACHE.get((_ENGINE.version, messy_title), count_miss=False)
+
+
+def normalise_title(messy_title: str) -> str:
+    """Repeatedly strip the noise matched by RULES from both ends of a TV title."""
+    engine = _ENGINE
+    key = (engine.version, messy_title)
+    clean_title = TITLE_CACHE.get(key)
+    if clean_title is None:
+        index = _INDEX
+        if index is not None and index.ruleset == engine.version:
+            clean_title = index.get(messy_title)
+            if clean_title is not None:
+                TITLE_CACHE.put(key, clean_title)
+                return clean_title
+        observer = _OBSERVER
+        if observer is None:
+            clean_title = engine.normalise(messy_title)
+        else:
+            trace = []
+            sample = _SAMPLE
+            if sample is not None and sample():
+                timings = {}
+                clean_title = engine.normalise_timed(messy_title, trace, timings)
+            else:
+                timings = None
+                clean_title = engine.normalise(messy_title, trace)
+            observer(engine, messy_title, trace, timings)
+        TITLE_CACHE.put(key, clean_title)
     return clean_title
+
+
+# Engines built from specs sent by the parent process (see normalise_many)
+_SPEC_ENGINES = {}
+
+
+def normalise_many(messy_titles, spec=None) -> list:
+    """Normalise a sequence of titles with the compiled engine, skipping the cache.
+
+    Meant for bulk work on already de-duplicated titles (e.g. in worker processes),
+    where caching would only add overhead. `spec` (from `RuleEngine.spec()`) pins
+    the rules to use, so worker processes follow rule-pack swaps in the parent.
+    """
+    engine = _ENGINE
+    if spec is not None and spec[0] != engine.version:
+        engine = _SPEC_ENGINES.get(spec[0])
+        if engine is None:
+            if len(_SPEC_ENGINES) >= 4:
+                _SPEC_ENGINES.clear()
+            engine = RuleEngine([re.compile(p, f) for p, f in spec[1]])
+            _SPEC_ENGINES[spec[0]] = engine
+    normalise = engine.normalise
+    return [normalise(t) for t in messy_titles]
@@ -0,0 +1,115 @@
+"""Prometheus metrics shared across uvicorn worker processes.
+
+With PROMETHEUS_MULTIPROC_DIR set before prometheus_client is imported (see
+`app.serve`), prometheus_client keeps every Counter/Histogram/Summary value in
+per-process mmap files in that directory, and `MultiProcessCollector` sums
+them at scrape time.
+
+The service's custom collectors (title cache, rule statistics, rule pack,
+jobs, ...) read in-process state when scraped, which another worker cannot
+see. Each worker therefore writes a snapshot of what those collectors
+currently report to `snapshot_<pid>.json` in the same directory, periodically
+and right before answering a scrape. `SnapshotCollector` merges the
+snapshots of all workers: counters and histograms are summed (those of exited
+workers are kept, so totals never go backwards), gauges of live workers are
+combined per family as configured (sum, max, min, or one series per pid).
+"""
+import glob
+import json
+import os
+import tempfile
+
+from prometheus_client.metrics_core import Metric
+from prometheus_client.registry import Collector
+
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+_CUMULATIVE_TYPES = frozenset({"counter", "histogram", "summary"})
+
+
+def multiproc_dir():
+    """The shared metrics directory, or None when running as a single process."""
+    return os.environ.get(MULTIPROC_DIR_ENV)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def write_snapshot(collectors, directory: str, pid: int = None) -> None:
+    """Write what `collectors` report now to this process's snapshot file."""
+    pid = os.getpid() if pid is None else pid
+    families = []
+    for collector in collectors:
+        for family in collector.collect():
+            families.append({
+                "name": family.name,
+                "documentation": family.documentation,
+                "type": family.type,
+                "unit": family.unit,
+                "samples": [[s.name, s.labels, s.value] for s in family.samples],
+            })
+    # A temporary file per call: a scrape and the periodic writer may overlap
+    fd, tmp = tempfile.mkstemp(prefix=f"snapshot_{pid}.", suffix=".tmp", dir=directory)
+    try:
+        with open(fd, "w", encoding="utf-8") as f:
+            json.dump(families, f)
+        os.replace(tmp, os.path.join(directory, f"snapshot_{pid}.json"))
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class SnapshotCollector(Collector):
+    """Merges the custom-collector snapshots written by every worker.
+
+    `gauge_modes` maps gauge family names to "sum" (the default), "max",
+    "min" or "pid" (keep one series per worker, labelled with its pid).
+    """
+
+    def __init__(self, directory: str, gauge_modes: dict = None):
+        self.directory = directory
+        self.gauge_modes = gauge_modes or {}
+
+    def _snapshots(self):
+        for path in glob.glob(os.path.join(self.directory, "snapshot_*.json")):
+            try:
+                pid = int(os.path.basename(path)[len("snapshot_"):-len(".json")])
+                with open(path, encoding="utf-8") as f:
+                    yield pid, json.load(f)
+            except (OSError, ValueError):
+                continue  # being replaced, or not ours
+
+    def collect(self):
+        families = {}  # name -> (template, {(sample name, labels): value})
+        for pid, snapshot in self._snapshots():
+            alive = _pid_alive(pid)
+            for family in snapshot:
+                cumulative = family["type"] in _CUMULATIVE_TYPES
+                if not cumulative and not alive:
+                    continue
+                mode = "sum" if cumulative else self.gauge_modes.get(family["name"], "sum")
+                _, values = families.setdefault(family["name"], (family, {}))
+                for name, labels, value in family["samples"]:
+                    if mode == "pid":
+                        labels = {**labels, "pid": str(pid)}
+                    key = (name, tuple(sorted(labels.items())))
+                    if key not in values:
+                        values[key] = value
+                    elif mode == "max":
+                        values[key] = max(values[key], value)
+                    elif mode == "min":
+                        values[key] = min(values[key], value)
+                    else:
+                        values[key] += value
+        for family, values in families.values():
+            metric = Metric(family["name"], family["documentation"], family["type"], family["unit"])
+            for (name, labels), value in values.items():
+                metric.add_sample(name, dict(labels), value)
+            yield metric
@@ -0,0 +1,133 @@
+"""Versioned rule packs.
+
+A rule pack is a JSON file holding a named, ordered rule list:
+
+    {
+      "version": "2024.06.1",
+      "rules": [
+        " (S\\\\d+ D\\\\d+|S\\\\d+|D\\\\d+)( RAIN DEL)?$",
+        {"pattern": "^M- ", "flags": ["IGNORECASE"]}
+      ]
+    }
+
+Each rule is a regex string, or an object with `pattern` and optional `flags`
+(names from the `re` module). Every rule must be anchored at exactly one end
+of the title, as in `app.model.RULES`.
+
+Packs are validated when the image is built:
+
+    python -m app.rulepacks validate rules/*.json
+
+Besides compiling each pack, `validate` normalises every title of a corpus
+(`--corpus`, by default the repository's `program_names (2).csv`) with the
+compiled engine and with the plain `re.sub` loop, and fails on any
+difference.
+"""
+import argparse
+import csv
+import json
+import re
+import sys
+from pathlib import Path
+
+from app.model import RuleEngine, apply_rules
+
+DEFAULT_CORPUS = Path(__file__).resolve().parents[1] / "program_names (2).csv"
+
+ALLOWED_FLAGS = {"IGNORECASE", "ASCII"}
+
+
+def _compile_rule(index: int, rule) -> re.Pattern:
+    if isinstance(rule, str):
+        pattern, flag_names = rule, []
+    elif isinstance(rule, dict) and isinstance(rule.get("pattern"), str):
+        pattern, flag_names = rule["pattern"], rule.get("flags", [])
+    else:
+        raise ValueError(f"rule {index}: expected a pattern string or an object with 'pattern'")
+    if not isinstance(flag_names, list) or not set(flag_names) <= ALLOWED_FLAGS:
+        raise ValueError(f"rule {index}: flags must be a list drawn from {sorted(ALLOWED_FLAGS)}")
+    flags = 0
+    for name in flag_names:
+        flags |= getattr(re, name)
+    try:
+        return re.compile(pattern, flags)
+    except re.error as e:
+        raise ValueError(f"rule {index}: {e}") from None
+
+
+def parse_rule_pack(data) -> RuleEngine:
+    """Validate a decoded rule pack and compile it into a RuleEngine. Raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("rule pack must be a JSON object")
+    version = data.get("version")
+    if not isinstance(version, str) or not version.strip():
+        raise ValueError("rule pack needs a non-empty 'version' string")
+    rules = data.get("rules")
+    if not isinstance(rules, list) or not rules:
+        raise ValueError("rule pack needs a non-empty 'rules' list")
+    compiled = [_compile_rule(i, rule) for i, rule in enumerate(rules)]
+    try:
+        return RuleEngine(compiled, pack_version=version)
+    except ValueError as e:
+        raise ValueError(f"rule pack {version!r}: {e}") from None
+
+
+def load_rule_pack(path) -> RuleEngine:
+    """Read, validate and compile the rule pack at `path`. Raises OSError or ValueError."""
+    text = Path(path).read_text(encoding="utf-8")
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{path}: invalid JSON: {e}") from None
+    return parse_rule_pack(data)
+
+
+def load_corpus(path) -> list:
+    """Titles from the first column of a CSV file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row[0] for row in csv.reader(f) if row]
+
+
+def check_against_reference(engine: RuleEngine, titles) -> list:
+    """(title, engine result, reference result) for every title the engine gets wrong."""
+    return [(title, clean, expected) for title in titles
+            if (clean := engine.normalise(title)) != (expected := apply_rules(engine.rules, title))]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.rulepacks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    validate = commands.add_parser("validate", help="compile packs and check them against a corpus")
+    validate.add_argument("packs", nargs="+", metavar="PACK.json")
+    validate.add_argument("--corpus", default=str(DEFAULT_CORPUS),
+                          help="CSV whose first column holds titles to check (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    try:
+        titles = load_corpus(args.corpus)
+    except OSError as e:
+        print(f"FAIL corpus {args.corpus}: {e}", file=sys.stderr)
+        return 1
+    failed = False
+    for path in args.packs:
+        try:
+            engine = load_rule_pack(path)
+        except (OSError, ValueError) as e:
+            print(f"FAIL {path}: {e}", file=sys.stderr)
+            failed = True
+            continue
+        mismatches = check_against_reference(engine, titles)
+        if mismatches:
+            title, clean, expected = mismatches[0]
+            print(f"FAIL {path}: {len(mismatches)} of {len(titles)} corpus titles differ from re.sub, "
+                  f"e.g. {title!r} -> {clean!r}, expected {expected!r}", file=sys.stderr)
+            failed = True
+            continue
+        print(f"ok   {path}: version {engine.pack_version}, {len(engine.rules)} rules, "
+              f"hash {engine.version}, compiled in {engine.compile_seconds * 1000:.1f}ms, "
+              f"{len(titles)} corpus titles match re.sub")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
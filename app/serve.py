@@ -0,0 +1,56 @@
+"""Run the service under uvicorn with one or more worker processes.
+
+    python -m app.serve --workers 4 --host 0.0.0.0 --port 8000
+
+Metrics stay correct with several workers: the launcher points
+PROMETHEUS_MULTIPROC_DIR at an emptied directory (a fresh temporary one
+unless the variable is already set) before the workers start, and every
+worker then records into, and answers /metrics from, that shared directory
+(see app.multiproc). The worker count is exported as SERVE_WORKERS, so
+endpoints whose state lives in a single worker can refuse to run with more
+than one.
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+
+import uvicorn
+
+# Deliberately not imported from app.multiproc: with a single worker uvicorn
+# serves from this process, and prometheus_client must not be imported here
+# before the variable is set.
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+WORKERS_ENV = "SERVE_WORKERS"
+
+
+def prepare_multiproc_dir(path: str) -> str:
+    """Create `path` and remove metric files left by an earlier run."""
+    os.makedirs(path, exist_ok=True)
+    for pattern in ("*.db", "snapshot_*.json", "snapshot_*.tmp"):
+        for stale in glob.glob(os.path.join(path, pattern)):
+            os.remove(stale)
+    return path
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.serve", description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "1")),
+                        help="worker processes (default: $WEB_CONCURRENCY or 1)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    directory = os.environ.get(MULTIPROC_DIR_ENV) or tempfile.mkdtemp(prefix="title-normaliser-metrics-")
+    # Must happen before app.main (and so prometheus_client) is imported
+    os.environ[MULTIPROC_DIR_ENV] = prepare_multiproc_dir(directory)
+    os.environ[WORKERS_ENV] = str(args.workers)
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers,
+                log_level=args.log_level)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
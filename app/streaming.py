@@ -0,0 +1,80 @@
+import json
+from typing import AsyncIterator, Callable, List
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+# A single title never needs more than this; anything longer is a broken stream.
+MAX_LINE_BYTES = 64 * 1024
+
+
+class LineTooLong(ValueError):
+    """A line longer than the limit; `line` is its 1-based number in the stream."""
+
+    def __init__(self, line: int, max_line_bytes: int):
+        super().__init__(f"line {line} exceeds {max_line_bytes} bytes")
+        self.line = line
+
+
+async def iter_line_chunks(chunks: AsyncIterator[bytes], max_line_bytes: int = MAX_LINE_BYTES):
+    """Split a byte stream on newlines, yielding the complete lines of each chunk.
+
+    Only the trailing partial line is carried between chunks, so memory stays
+    bounded by the chunk size plus `max_line_bytes` however long the stream is.
+    A line longer than `max_line_bytes` raises LineTooLong once every line
+    before it has been yielded.
+    """
+    pending = b""
+    line_no = 1  # number of the first line in `pending`
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        lines = (pending + chunk).split(b"\n")  # the last item is the new partial line
+        if max(map(len, lines)) > max_line_bytes:
+            too_long = next(i for i, line in enumerate(lines) if len(line) > max_line_bytes)
+            if too_long:
+                yield lines[:too_long]
+            raise LineTooLong(line_no + too_long, max_line_bytes)
+        pending = lines.pop()
+        if lines:
+            yield lines
+            line_no += len(lines)
+    if pending:
+        yield [pending]
+
+
+def parse_line(line: bytes, ndjson: bool):
+    """Return the title carried by one input line, or None for a skippable blank line.
+
+    Plain-text lines are the title itself. NDJSON lines may be a JSON string or
+    an object with a `messy_title` field.
+    """
+    text = line.decode("utf-8").rstrip("\r")
+    if not ndjson:
+        return text
+    if not text.strip():
+        return None
+    value = json.loads(text)
+    if isinstance(value, dict):
+        value = value.get("messy_title")
+    if not isinstance(value, str):
+        raise ValueError("expected a string or an object with a 'messy_title' string")
+    return value
+
+
+def render_results(lines: List[bytes], ndjson: bool, first_line: int,
+                   normalise: Callable[[str], str]) -> bytes:
+    """Normalise one chunk of input lines into NDJSON result lines, in input order.
+
+    A line that cannot be parsed produces an `error` record carrying its 1-based
+    line number instead of aborting the rest of the stream.
+    """
+    out = []
+    for offset, line in enumerate(lines):
+        try:
+            title = parse_line(line, ndjson)
+        except ValueError as e:  # includes UnicodeDecodeError / JSONDecodeError
+            out.append({"line": first_line + offset, "error": str(e)})
+            continue
+        if title is not None:
+            out.append({"clean_title": normalise(title)})
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in out).encode("utf-8")
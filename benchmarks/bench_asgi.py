@@ -0,0 +1,81 @@
+"""In-process requests/second for the FastAPI app, without a server or network.
+
+Drives `app.main:app` directly through the ASGI interface, so the number
+reflects the app's own per-request overhead (middleware, validation, JSON,
+threadpool dispatch) rather than the HTTP server or client:
+
+    python -m benchmarks.bench_asgi --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from app.main import app
+
+
+def _scope(method: str, path: str, body: bytes, headers=()) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                    *headers],
+        "client": ("127.0.0.1", 12345),
+        "server": ("127.0.0.1", 8000),
+    }
+
+
+async def _request(scope: dict, body: bytes) -> int:
+    status = 0
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()  # never disconnect
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(dict(scope), receive, send)
+    return status
+
+
+async def run(path: str, payload: dict, requests: int, warmup: int = 500) -> dict:
+    body = json.dumps(payload).encode()
+    scope = _scope("POST", path, body)
+    for _ in range(warmup):
+        await _request(scope, body)
+    start = time.perf_counter()
+    for _ in range(requests):
+        status = await _request(scope, body)
+        if status != 200:
+            raise RuntimeError(f"{path} returned {status}")
+    elapsed = time.perf_counter() - start
+    return {"path": path, "requests": requests, "requests_per_second": round(requests / elapsed, 1)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_asgi", description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--title", default="GOTHAM -RPT")
+    args = parser.parse_args(argv)
+    result = asyncio.run(run("/normalise", {"messy_title": args.title}, args.requests))
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
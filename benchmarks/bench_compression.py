@@ -0,0 +1,98 @@
+"""Compressed vs uncompressed /normalise-batch traffic, in-process.
+
+Builds batches from the title corpus and sends each through the ASGI app
+plain, gzip-encoded and (with `zstandard` installed) zstd-encoded in both
+directions, reporting bytes on the wire and requests/second:
+
+    python -m benchmarks.bench_compression --batch-size 1000 --requests 200
+
+Requests/second here is the app's CPU cost including (de)compression; the
+saving shows up as fewer bytes on the wire, so compare both columns.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import sys
+import time
+
+from app.compression import ENCODERS
+from app.main import app
+from benchmarks.bench_asgi import _scope
+from benchmarks.bench_normaliser import load_corpus
+
+
+def _compress(encoding: str, data: bytes) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=3)
+    import zstandard
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+async def _request(scope: dict, body: bytes):
+    status, sent = 0, 0
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()  # never disconnect
+
+    async def send(message):
+        nonlocal status, sent
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            sent += len(message.get("body", b""))
+
+    await app(dict(scope), receive, send)
+    return status, sent
+
+
+async def run(encoding, batch: list, requests: int, warmup: int = 20) -> dict:
+    raw = json.dumps({"messy_titles": batch}).encode()
+    if encoding is None:
+        body, headers = raw, ()
+    else:
+        body = _compress(encoding, raw)
+        headers = ((b"content-encoding", encoding.encode()), (b"accept-encoding", encoding.encode()))
+    scope = _scope("POST", "/normalise-batch", body, headers)
+    for _ in range(warmup):
+        await _request(scope, body)
+    start = time.perf_counter()
+    for _ in range(requests):
+        status, response_bytes = await _request(scope, body)
+        if status != 200:
+            raise RuntimeError(f"{encoding or 'identity'} returned {status}")
+    elapsed = time.perf_counter() - start
+    return {
+        "encoding": encoding or "identity",
+        "request_bytes": len(body),
+        "response_bytes": response_bytes,
+        "requests_per_second": round(requests / elapsed, 1),
+        "titles_per_second": round(requests * len(batch) / elapsed, 1),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_compression",
+                                     description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus()
+    batch = random.Random(args.seed).choices(corpus, k=args.batch_size)
+    for encoding in [None, "gzip", "zstd"]:
+        if encoding is not None and encoding not in ENCODERS:
+            continue
+        print(json.dumps(asyncio.run(run(encoding, batch, args.requests))))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""Catalogue matching benchmark on a 100k+ title catalogue.
+
+The catalogue holds every distinct clean title from the corpus plus synthetic
+titles made of corpus words, up to `--size` entries. Queries are corpus titles
+(exact matches after normalisation) and variants with `&`/AND swapped,
+apostrophes dropped or one character mistyped:
+
+    python -m benchmarks.bench_matching --size 100000
+
+Reports build and insert rates, index memory, and lookups/second for the
+inverted index at several catalogue sizes, against a linear scan of the same
+catalogue on a small sample, to show lookups stay sublinear.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from app.matching import CatalogueIndex, dice, match_key, trigrams
+from app.model import normalise_many
+from benchmarks.bench_normaliser import load_corpus
+
+
+def build_catalogue(size: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    clean = list(dict.fromkeys(t for t in normalise_many(load_corpus()) if t))
+    words = sorted({w for t in clean for w in t.split() if w.isalpha() and len(w) > 2})
+    titles = dict.fromkeys(clean)
+    while len(titles) < size:
+        titles.setdefault(" ".join(rng.choice(words) for _ in range(rng.randint(2, 5))))
+    return [(f"c{i}", t) for i, t in enumerate(titles)]
+
+
+def make_queries(count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    corpus = load_corpus()
+    queries = []
+    for _ in range(count):
+        title = rng.choice(corpus)
+        kind = rng.random()
+        if kind < 0.25:
+            title = title.replace(" & ", " AND ") if "&" in title else title.replace(" AND ", " & ")
+        elif kind < 0.5:
+            title = title.replace("'", "")
+        elif kind < 0.75 and len(title) > 4:
+            i = rng.randrange(len(title))
+            title = title[:i] + rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") + title[i + 1:]
+        queries.append(title)
+    return normalise_many(queries)
+
+
+def linear_match(entries: list, clean_title: str):
+    query = trigrams(match_key(clean_title))
+    return max(entries, key=lambda e: dice(query, e[2]))
+
+
+def run(size: int, queries: int, scan_sample: int) -> dict:
+    catalogue = build_catalogue(size)
+    query_titles = make_queries(queries)
+    results = {"catalogue_size": len(catalogue), "queries": len(query_titles), "sizes": []}
+
+    start = time.perf_counter()
+    index = CatalogueIndex()
+    for canonical_id, title in catalogue:
+        index.add(canonical_id, title)
+    build_seconds = time.perf_counter() - start
+    del index
+    tracemalloc.start()
+    index = CatalogueIndex()
+    for canonical_id, title in catalogue:
+        index.add(canonical_id, title)
+    results["index_bytes"] = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del index
+    results["build_seconds"] = round(build_seconds, 3)
+    results["inserts_per_second"] = round(len(catalogue) / build_seconds, 1)
+
+    for n in sorted({size // 10, size // 2, size}):
+        sub = CatalogueIndex()
+        for canonical_id, title in catalogue[:n]:
+            sub.add(canonical_id, title)
+        start = time.perf_counter()
+        matched = sum(1 for q in query_titles if sub.match(q, 0.5))
+        elapsed = time.perf_counter() - start
+
+        entries = [(cid, t, trigrams(match_key(t))) for cid, t in catalogue[:n]]
+        sample = query_titles[:scan_sample]
+        start = time.perf_counter()
+        best = [linear_match(entries, q) for q in sample]
+        scan = (time.perf_counter() - start) / len(sample)
+        # Same score as the exhaustive best (ties may pick a different entry)
+        agree = sum(1 for q, (_, _, grams) in zip(sample, best)
+                    if (sub.match(q) or {}).get("score") == round(dice(trigrams(match_key(q)), grams), 4))
+        results["sizes"].append({
+            "catalogue": n,
+            "index_lookups_per_second": round(len(query_titles) / elapsed, 1),
+            "index_us_per_lookup": round(elapsed / len(query_titles) * 1e6, 1),
+            "scan_us_per_lookup": round(scan * 1e6, 1),
+            "matched_at_0.5": round(matched / len(query_titles), 4),
+            "agreement_with_scan": round(agree / len(sample), 4),
+        })
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_matching",
+                                     description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100000, help="catalogue entries (default: 100000)")
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--scan-sample", type=int, default=50, help="queries timed with the linear scan")
+    args = parser.parse_args(argv)
+    print(json.dumps(run(args.size, args.queries, args.scan_sample), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
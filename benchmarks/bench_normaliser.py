@@ -0,0 +1,197 @@
+"""Micro-benchmarks for the title normaliser.
+
+Measures, on the real corpus and on synthetic titles with many stacked suffixes:
+
+- titles per second through the compiled engine (uncached) and the plain
+  `re.sub` reference loop
+- cost and match count of each rule in RULES, through the engine's own
+  anchored per-rule matcher
+- distribution of passes ("recursion depth") needed per title
+- peak memory allocated while normalising one title
+
+    python -m benchmarks.bench_normaliser --output bench.json
+    python -m benchmarks.bench_normaliser --baseline benchmarks/baseline.json --threshold 0.2
+
+With `--baseline`, the run exits non-zero if any throughput drops, or any
+per-title allocation grows, by more than `--threshold` (a fraction).
+"""
+import argparse
+import csv
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+from app.model import RULES, RuleEngine, apply_rules, normalise_many
+
+CORPUS_PATH = Path(__file__).resolve().parents[1] / "program_names (2).csv"
+
+# Suffixes that RULES strip, used to build worst-case stacked titles
+NOISE = ["-RPT", "-PM", "5PM", "(R)", "[LIVE]", "S01 E02", "D4 S2 RAIN DEL", "-POST MATCH",
+         "- SESSION 1", "PART 2", "EP.3", "TX1", "FEED2", "-THU", "-LATE", "12"]
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row[0] for row in csv.reader(f) if row]
+
+
+def stacked_titles(depth: int, count: int = 500, seed: int = 0):
+    rng = random.Random(seed)
+    return ["SHOW %d " % i + " ".join(rng.choice(NOISE) for _ in range(depth)) for i in range(count)]
+
+
+def count_passes(title: str) -> int:
+    """Number of passes over RULES until the title stops changing (the old recursion depth)."""
+    passes = 0
+    while True:
+        passes += 1
+        clean = title
+        for rule in RULES:
+            clean = rule.sub("", clean)
+        clean = clean.strip()
+        if clean == title or not clean:
+            return passes
+        title = clean
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_throughput(titles, repeat: int) -> dict:
+    engine = _best_of(lambda: normalise_many(titles), repeat)
+    reference = _best_of(lambda: [apply_rules(RULES, t) for t in titles], repeat)
+    return {
+        "titles": len(titles),
+        "engine_titles_per_second": round(len(titles) / engine, 1),
+        "reference_titles_per_second": round(len(titles) / reference, 1),
+    }
+
+
+def bench_rules(titles, repeat: int) -> list:
+    """Cost of trying each rule once at the end (or start) of every title, as the engine does.
+
+    Suffix rules are timed with their reversed pattern matched against the
+    reversed title, prefix rules with their pattern matched at the start and
+    "search" rules (see RuleEngine) searched for; the title is reversed once
+    per title by the engine, so that is left out.
+    """
+    engine = RuleEngine(RULES)
+    reversed_titles = [t[::-1] for t in titles]
+    results = []
+    for index, (kind, matcher) in enumerate(engine.rule_matchers):
+        subjects = reversed_titles if kind == "suffix" else titles
+        match = matcher.search if kind == "search" else matcher.match
+        seconds = _best_of(lambda: [match(s) for s in subjects], repeat)
+        matches = sum(1 for s in subjects if match(s))
+        results.append({
+            "rule": index,
+            "pattern": RULES[index].pattern,
+            "kind": kind,
+            "matches": matches,
+            "ns_per_title": round(seconds / len(titles) * 1e9, 1),
+        })
+    return results
+
+
+def bench_passes(titles) -> dict:
+    histogram = Counter(count_passes(t) for t in titles)
+    return {str(depth): histogram[depth] for depth in sorted(histogram)}
+
+
+def bench_memory(titles, sample: int = 2000) -> dict:
+    """Peak bytes allocated while normalising a single title (cache bypassed)."""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for title in titles[:sample]:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            normalise_many([title])
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    peaks.sort()
+    return {
+        "mean_peak_bytes_per_title": round(sum(peaks) / len(peaks), 1),
+        "p95_peak_bytes_per_title": peaks[int(0.95 * (len(peaks) - 1))],
+        "max_peak_bytes_per_title": peaks[-1],
+    }
+
+
+def run(repeat: int = 3, depths=(5, 20, 100)) -> dict:
+    datasets = {"corpus": load_corpus()}
+    for depth in depths:
+        datasets[f"stacked_{depth}"] = stacked_titles(depth)
+
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "datasets": {},
+        "rules": bench_rules(datasets["corpus"], repeat),
+    }
+    for name, titles in datasets.items():
+        results["datasets"][name] = {
+            **bench_throughput(titles, repeat),
+            "passes": bench_passes(titles),
+            **bench_memory(titles),
+        }
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Return human-readable regressions of `current` against `baseline` beyond `threshold`."""
+    regressions = []
+    for name, base in baseline.get("datasets", {}).items():
+        cur = current["datasets"].get(name)
+        if cur is None:
+            continue
+        key = "engine_titles_per_second"
+        if cur[key] < base[key] * (1 - threshold):
+            regressions.append(f"{name}: {key} {cur[key]:.0f} < baseline {base[key]:.0f}")
+        key = "mean_peak_bytes_per_title"
+        if cur[key] > base[key] * (1 + threshold):
+            regressions.append(f"{name}: {key} {cur[key]:.0f} > baseline {base[key]:.0f}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_normaliser",
+                                     description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write results as JSON to this file (default: stdout)")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed relative regression before failing (default: 0.2)")
+    parser.add_argument("--repeat", type=int, default=3, help="timing repeats, best is kept")
+    args = parser.parse_args(argv)
+
+    results = run(repeat=args.repeat)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%} against {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
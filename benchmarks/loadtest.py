@@ -0,0 +1,261 @@
+"""End-to-end HTTP load test for the service.
+
+Starts the service with `python -m app.serve` (or targets `--url`), sends traffic with
+the async httpx client and prints a JSON report with throughput, latency
+percentiles and error rate:
+
+    python -m benchmarks.loadtest --workers 2 --concurrency 32 --duration 30
+    python -m benchmarks.loadtest --url http://localhost:8000 --trace trace.jsonl --rate 500
+
+Traffic is either replayed from a JSONL trace, one request per line:
+
+    {"method": "POST", "path": "/normalise", "body": {"messy_title": "GOTHAM -RPT"}}
+    {"method": "GET", "path": "/metrics"}
+
+or synthesised from `program_names (2).csv` as a mix of `/normalise` and
+`/normalise-batch` calls (`--batch-ratio`, `--batch-size`). Without `--rate`
+the test is closed-loop: `--concurrency` clients each send their next request
+as soon as the previous one returns. With `--rate` requests are sent on a
+fixed schedule and latency is measured from the scheduled time, so a slow
+server cannot hide its queueing delay.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from itertools import cycle
+from pathlib import Path
+
+import httpx
+
+from benchmarks.bench_normaliser import load_corpus
+
+
+def load_trace(path) -> list:
+    """Read a JSONL trace into (method, path, body) requests. Raises ValueError on bad lines."""
+    requests = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                requests.append((record.get("method", "POST").upper(), record["path"], record.get("body")))
+            except (ValueError, KeyError, AttributeError) as e:
+                raise ValueError(f"{path}:{line_no}: bad trace record: {e}") from None
+    if not requests:
+        raise ValueError(f"{path}: empty trace")
+    return requests
+
+
+def synthetic_requests(count: int, batch_ratio: float = 0.1, batch_size: int = 100, seed: int = 0) -> list:
+    """Single and batch normalise requests built from corpus titles."""
+    rng = random.Random(seed)
+    corpus = load_corpus()
+    requests = []
+    for _ in range(count):
+        if rng.random() < batch_ratio:
+            requests.append(("POST", "/normalise-batch", {"messy_titles": rng.choices(corpus, k=batch_size)}))
+        else:
+            requests.append(("POST", "/normalise", {"messy_title": rng.choice(corpus)}))
+    return requests
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an ascending list (q in 0-100)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarise(samples: list, elapsed: float) -> dict:
+    """Report for (path, status, seconds) samples; status 0 means a transport error."""
+    def stats(rows):
+        latencies = sorted(s for _, _, s in rows)
+        errors = sum(1 for _, status, _ in rows if status == 0 or status >= 400)
+        return {
+            "requests": len(rows),
+            "errors": errors,
+            "error_rate": round(errors / len(rows), 4) if rows else 0.0,
+            "throughput_rps": round(len(rows) / elapsed, 1) if elapsed else 0.0,
+            "latency_ms": {
+                "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+                "p50": round(percentile(latencies, 50) * 1000, 2),
+                "p95": round(percentile(latencies, 95) * 1000, 2),
+                "p99": round(percentile(latencies, 99) * 1000, 2),
+                "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            },
+        }
+
+    by_path = defaultdict(list)
+    for sample in samples:
+        by_path[sample[0]].append(sample)
+    return {
+        **stats(samples),
+        "duration_seconds": round(elapsed, 3),
+        "status_codes": {str(k): v for k, v in sorted(Counter(s for _, s, _ in samples).items())},
+        "by_path": {path: stats(rows) for path, rows in sorted(by_path.items())},
+    }
+
+
+async def _send(client: httpx.AsyncClient, request) -> int:
+    method, path, body = request
+    try:
+        response = await client.request(method, path, json=body)
+        await response.aread()
+        return response.status_code
+    except httpx.HTTPError:
+        return 0
+
+
+async def run_load(client: httpx.AsyncClient, requests: list, concurrency: int = 16,
+                   duration: float = None, total: int = None, rate: float = None) -> dict:
+    """Send `requests` (cycled) until `duration` seconds or `total` requests, then summarise."""
+    if duration is None and total is None:
+        total = len(requests)
+    samples = []
+    source = cycle(requests)
+    start = time.perf_counter()
+    deadline = start + duration if duration is not None else float("inf")
+    sent = 0
+
+    def more() -> bool:
+        return (total is None or sent < total) and time.perf_counter() < deadline
+
+    if rate is None:
+        async def worker():
+            nonlocal sent
+            while more():
+                sent += 1
+                request = next(source)
+                t0 = time.perf_counter()
+                status = await _send(client, request)
+                samples.append((request[1], status, time.perf_counter() - t0))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    else:
+        async def timed(request, scheduled):
+            status = await _send(client, request)
+            samples.append((request[1], status, time.perf_counter() - scheduled))
+
+        tasks = []
+        while more():
+            scheduled = start + sent / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sent += 1
+            tasks.append(asyncio.create_task(timed(next(source), scheduled)))
+        await asyncio.gather(*tasks)
+    return summarise(samples, time.perf_counter() - start)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int, port: int, env: dict = None, timeout: float = 60) -> subprocess.Popen:
+    """Launch the service with `workers` processes and wait until it answers."""
+    root = Path(__file__).resolve().parents[1]
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.serve", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=root, env={**os.environ, **(env or {})},
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/openapi.json", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    stop_server(proc)
+    raise RuntimeError(f"server did not start within {timeout}s")
+
+
+def stop_server(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+async def _run_against(url: str, requests: list, args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency if args.rate is None else None)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        if args.warmup:
+            await run_load(client, requests, concurrency=args.concurrency, total=args.warmup)
+        return await run_load(client, requests, concurrency=args.concurrency, duration=args.duration,
+                              total=args.requests, rate=args.rate)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="target a running server instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the started server")
+    parser.add_argument("--trace", help="JSONL trace to replay (default: synthetic traffic)")
+    parser.add_argument("--batch-ratio", type=float, default=0.1, help="share of synthetic batch requests")
+    parser.add_argument("--batch-size", type=int, default=100, help="titles per synthetic batch request")
+    parser.add_argument("--concurrency", type=int, default=16, help="closed-loop clients (default: 16)")
+    parser.add_argument("--rate", type=float, help="open-loop requests/second instead of closed-loop")
+    parser.add_argument("--duration", type=float, help="seconds to run (default: 10 unless --requests)")
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--warmup", type=int, default=200, help="requests sent before measuring")
+    parser.add_argument("--timeout", type=float, default=30, help="per-request timeout in seconds")
+    parser.add_argument("--output", help="write the JSON report to this file (default: stdout)")
+    args = parser.parse_args(argv)
+    if args.duration is None and args.requests is None:
+        args.duration = 10.0
+
+    requests = load_trace(args.trace) if args.trace else synthetic_requests(
+        10000, batch_ratio=args.batch_ratio, batch_size=args.batch_size)
+
+    proc = None
+    url = args.url
+    if url is None:
+        port = _free_port()
+        proc = start_server(args.workers, port)
+        url = f"http://127.0.0.1:{port}"
+    try:
+        report = asyncio.run(_run_against(url, requests, args))
+    finally:
+        if proc is not None:
+            stop_server(proc)
+
+    report = {
+        "config": {
+            "url": args.url or "started",
+            "workers": None if args.url else args.workers,
+            "traffic": args.trace or f"synthetic (batch ratio {args.batch_ratio}, batch size {args.batch_size})",
+            "concurrency": None if args.rate else args.concurrency,
+            "rate": args.rate,
+            "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+        },
+        **report,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
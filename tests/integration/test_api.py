@@ -1,6 +1,9 @@
 import pytest
 from fastapi.testclient import TestClient
+import json
+import os
 import types
+from app.main import app
 # ------------------------------------------------
 # Integration tests for the FastAPI application
 # Assumes tests/conftest.py provides `app_client`
@@ -209,4 +212,653 @@ def test_batch_normalise_internal_error(client, monkeypatch):
     r = client.post("/normalise-batch", json={"messy_titles": ["A -RPT", "B -RPT"]})
     assert r.status_code == 500
     body = r.json()
-    assert "detail" in body and "oh no" in body["detail"]
\ No newline at end of file
+    assert "detail" in body and "oh no" in body["detail"]
+
+@pytest.mark.integration
+def test_metrics_expose_title_cache(client: TestClient):
+    """Cache hit/miss/eviction counters and size gauges are exported on /metrics."""
+    client.post("/normalise", json={"messy_title": "CACHED TITLE -RPT"})
+    client.post("/normalise", json={"messy_title": "CACHED TITLE -RPT"})
+    body = client.get("/metrics").text
+    for name in ("normalise_cache_hits_total", "normalise_cache_misses_total",
+                 "normalise_cache_evictions_total", "normalise_cache_size",
+                 "normalise_cache_capacity"):
+        assert name in body
+
+
+# ---------------------------
+# Streaming endpoint
+# ---------------------------
+
+@pytest.mark.integration
+def test_stream_plain_text_lines(client: TestClient):
+    """Plain-text body: one title per line, results streamed back as NDJSON in order."""
+    body = "GOTHAM -RPT\r\nHOT SEAT -5PM\n\nMIXOLOGY-EARLY(R)"
+    r = client.post("/normalise-stream", content=body, headers={"Content-Type": "text/plain"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert lines == [
+        {"clean_title": "GOTHAM"},
+        {"clean_title": "HOT SEAT"},
+        {"clean_title": ""},
+        {"clean_title": "MIXOLOGY"},
+    ]
+
+
+@pytest.mark.integration
+def test_stream_ndjson_chunked_body(client: TestClient):
+    """NDJSON body sent in chunks that split records mid-line and mid-character."""
+    payload = '"POKÉMON - ENCORE"\n{"messy_title": "GOTHAM -RPT"}\n\n42\n"A -RPT"\n'.encode("utf-8")
+
+    def chunks():
+        for i in range(0, len(payload), 5):
+            yield payload[i:i + 5]
+
+    r = client.post("/normalise-stream", content=chunks(),
+                    headers={"Content-Type": "application/x-ndjson"})
+    assert r.status_code == 200
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert lines[:2] == [{"clean_title": "POKÉMON"}, {"clean_title": "GOTHAM"}]
+    assert lines[2]["line"] == 4 and "error" in lines[2]
+    assert lines[3] == {"clean_title": "A"}
+
+
+@pytest.mark.integration
+def test_stream_large_input(client: TestClient):
+    n = 20000
+    body = "".join(f"TITLE{i} -RPT\n" for i in range(n))
+    r = client.post("/normalise-stream", content=body)
+    assert r.status_code == 200
+    lines = r.text.splitlines()
+    assert len(lines) == n
+    assert json.loads(lines[-1]) == {"clean_title": f"TITLE{n - 1}"}
+
+
+def _aborted_upload(path: str) -> list:
+    """Send one chunk of a body to `path`, then disconnect; return the messages sent back."""
+    import asyncio
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "root_path": "", "headers": [(b"content-type", b"text/plain")],
+             "client": ("127.0.0.1", 1), "server": ("testserver", 80)}
+    incoming = [{"type": "http.request", "body": b"GOTHAM -RPT\nHOT SE", "more_body": True},
+                {"type": "http.disconnect"}]
+    sent = []
+
+    async def receive():
+        return incoming.pop(0) if incoming else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent
+
+
+@pytest.mark.integration
+def test_stream_overlong_line_reported_after_earlier_results(client: TestClient):
+    """Lines before an overlong one still get results; the error names the overlong line."""
+    def chunks():
+        yield b"A -RPT\nB -RPT\n" + b"X" * 70000
+        yield b"\nC -RPT\n"
+
+    r = client.post("/normalise-stream", content=chunks())
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert lines[:2] == [{"clean_title": "A"}, {"clean_title": "B"}]
+    assert lines[2]["line"] == 3 and "exceeds" in lines[2]["error"]
+    assert len(lines) == 3
+
+
+@pytest.mark.integration
+def test_stream_client_disconnect_ends_quietly():
+    """An upload aborted mid-body ends the stream instead of raising ClientDisconnect."""
+    sent = _aborted_upload("/normalise-stream")
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    assert json.loads(body.splitlines()[0]) == {"clean_title": "GOTHAM"}
+    assert sent[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
+
+
+@pytest.mark.integration
+def test_job_client_disconnect_is_not_queued():
+    from app.main import JOBS
+    before = set(JOBS.jobs)
+    sent = _aborted_upload("/jobs")
+    assert sent[0]["status"] == 499
+    assert set(JOBS.jobs) == before
+
+
+@pytest.mark.integration
+def test_batch_process_pool_mode(monkeypatch):
+    """Batches above the threshold go to the startup process pool; results match the thread path."""
+    monkeypatch.setattr("app.main.BATCH_EXECUTOR", "process")
+    monkeypatch.setattr("app.main.BATCH_PROCESS_THRESHOLD", 10)
+    monkeypatch.setattr("app.main.BATCH_PROCESS_WORKERS", 2)
+    messy = [f"TITLE{i % 40} -RPT" for i in range(200)] + ["GOTHAM -RPT", "GOTHAM -RPT"]
+
+    with TestClient(app) as pooled:
+        assert pooled.app.state.batch_pool is not None
+        r = pooled.post("/normalise-batch", json={"messy_titles": messy})
+        small = pooled.post("/normalise-batch", json={"messy_titles": ["HOT SEAT -5PM"]})
+    assert app.state.batch_pool is None
+
+    assert r.status_code == 200
+    assert r.json()["clean_titles"] == [f"TITLE{i % 40}" for i in range(200)] + ["GOTHAM", "GOTHAM"]
+    assert small.json()["clean_titles"] == ["HOT SEAT"]
+
+
+@pytest.mark.integration
+def test_metrics_expose_normaliser_instrumentation(client: TestClient, monkeypatch):
+    """Per-rule matches and timings, passes per title and batch sizes appear on /metrics."""
+    monkeypatch.setattr("app.main.RULE_TIMING_SAMPLE_RATE", 1.0)
+    client.post("/normalise-batch", json={"messy_titles": ["INSTRUMENTED SHOW -RPT", "INSTRUMENTED (R)"]})
+    body = client.get("/metrics").text
+    assert 'normaliser_rule_matches_total{rule="4"}' in body       # ' -RPT'
+    assert 'normaliser_rule_matches_total{rule="7"}' in body       # ' (R)'
+    for rule in ("0", "4", "7", "12"):
+        assert f'normaliser_rule_duration_seconds_count{{rule="{rule}"}}' in body
+    assert "normaliser_passes_bucket" in body
+    assert "normalise_batch_size_bucket" in body
+
+
+@pytest.mark.integration
+def test_metrics_label_by_route_template_and_fold_unmatched(client: TestClient):
+    """Unknown URLs share one 'unmatched' series instead of one series per raw path."""
+    for i in range(5):
+        assert client.get(f"/wp-admin/probe-{i}.php").status_code == 404
+    client.post("/normalise", json={"messy_title": "A -RPT"})
+    body = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",path="unmatched",status="404"}' in body
+    assert "probe-" not in body
+    assert 'http_requests_total{method="POST",path="/normalise",status="200"}' in body
+    assert 'path="/metrics"' not in body
+
+
+# ---------------------------
+# Rule pack admin API
+# ---------------------------
+
+@pytest.fixture
+def admin(client: TestClient, monkeypatch):
+    """Enable the admin API and restore the active rule engine afterwards."""
+    from app import model
+    monkeypatch.setattr("app.main.ADMIN_TOKEN", "s3cret")
+    engine = model.get_engine()
+    yield {"Authorization": "Bearer s3cret"}
+    model.swap_engine(engine)
+
+
+@pytest.mark.integration
+def test_admin_rules_disabled_without_token(client: TestClient, monkeypatch):
+    monkeypatch.setattr("app.main.ADMIN_TOKEN", None)
+    assert client.get("/admin/rules").status_code == 403
+
+
+@pytest.mark.integration
+def test_admin_rules_rejects_wrong_token(client: TestClient, admin):
+    assert client.get("/admin/rules", headers={"Authorization": "Bearer nope"}).status_code == 401
+    # Non-ASCII header bytes are refused like any other wrong token
+    assert client.get("/admin/rules", headers={"Authorization": b"Bearer s\xe9cret"}).status_code == 401
+
+
+@pytest.mark.integration
+def test_admin_swap_rule_pack(client: TestClient, admin):
+    """Uploading a pack swaps the rules for new requests and is reported on /metrics."""
+    assert client.post("/normalise", json={"messy_title": "GOTHAM -RPT"}).json()["clean_title"] == "GOTHAM"
+
+    pack = {"version": "test-2", "rules": [" XYZ$"]}
+    r = client.put("/admin/rules", json=pack, headers=admin)
+    assert r.status_code == 200
+    assert r.json()["version"] == "test-2" and r.json()["rules"] == 1
+    assert client.get("/admin/rules", headers=admin).json()["version"] == "test-2"
+
+    # the cached result for the old rules must not be served
+    assert client.post("/normalise", json={"messy_title": "GOTHAM -RPT"}).json()["clean_title"] == "GOTHAM -RPT"
+    assert client.post("/normalise", json={"messy_title": "GOTHAM XYZ"}).json()["clean_title"] == "GOTHAM"
+
+    body = client.get("/metrics").text
+    assert 'normaliser_rule_pack_info{hash="' in body and 'version="test-2"' in body
+    assert "normaliser_rule_pack_compile_seconds" in body
+
+
+@pytest.mark.integration
+def test_admin_rejects_invalid_rule_pack(client: TestClient, admin):
+    before = client.get("/admin/rules", headers=admin).json()
+    r = client.put("/admin/rules", json={"version": "bad", "rules": ["RPT"]}, headers=admin)
+    assert r.status_code == 400
+    assert "anchored" in r.json()["detail"]
+    assert client.get("/admin/rules", headers=admin).json() == before
+
+
+@pytest.mark.integration
+def test_rule_pack_file_watch(tmp_path, admin):
+    """Changing the watched pack file activates it; a broken file keeps the old rules."""
+    import asyncio
+    from app import model
+    from app.main import _watch_rule_pack
+
+    path = tmp_path / "pack.json"
+    path.write_text(json.dumps({"version": "w1", "rules": [" XYZ$"]}), encoding="utf-8")
+
+    async def scenario():
+        task = asyncio.create_task(_watch_rule_pack(str(path), 0.01))
+        await asyncio.sleep(0.05)
+        path.write_text(json.dumps({"version": "w2", "rules": [" ABC$"]}), encoding="utf-8")
+        os.utime(path, ns=(1, 10**18))
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if model.get_engine().pack_version == "w2":
+                break
+        path.write_text("{not json", encoding="utf-8")
+        os.utime(path, ns=(1, 2 * 10**18))
+        await asyncio.sleep(0.2)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert model.get_engine().pack_version == "w2"
+
+
+# ---------------------------
+# Compressed bodies
+# ---------------------------
+
+@pytest.mark.integration
+def test_batch_gzip_request_and_response(client: TestClient):
+    import gzip
+    titles = [f"TITLE{i} -RPT" for i in range(2000)]
+    body = gzip.compress(json.dumps({"messy_titles": titles}).encode())
+    r = client.post("/normalise-batch", content=body,
+                    headers={"Content-Type": "application/json", "Content-Encoding": "gzip",
+                             "Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in r.headers["vary"].lower()
+    assert r.json()["clean_titles"] == [f"TITLE{i}" for i in range(2000)]
+
+
+@pytest.mark.integration
+def test_small_response_left_uncompressed(client: TestClient):
+    r = client.post("/normalise", json={"messy_title": "GOTHAM -RPT"}, headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert "content-encoding" not in r.headers
+
+
+@pytest.mark.integration
+def test_stream_gzip_request_and_response(client: TestClient):
+    import gzip
+    n = 5000
+    payload = gzip.compress("".join(f"TITLE{i} -RPT\n" for i in range(n)).encode())
+
+    def chunks():
+        for i in range(0, len(payload), 1000):
+            yield payload[i:i + 1000]
+
+    r = client.post("/normalise-stream", content=chunks(),
+                    headers={"Content-Encoding": "gzip", "Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+    lines = r.text.splitlines()
+    assert len(lines) == n
+    assert json.loads(lines[-1]) == {"clean_title": f"TITLE{n - 1}"}
+
+
+@pytest.mark.integration
+def test_zstd_request_body(client: TestClient):
+    zstandard = pytest.importorskip("zstandard")
+    body = zstandard.ZstdCompressor().compress(json.dumps({"messy_titles": ["GOTHAM -RPT"]}).encode())
+    r = client.post("/normalise-batch", content=body,
+                    headers={"Content-Type": "application/json", "Content-Encoding": "zstd"})
+    assert r.status_code == 200
+    assert r.json() == {"clean_titles": ["GOTHAM"]}
+
+
+@pytest.mark.integration
+def test_unsupported_content_encoding(client: TestClient):
+    r = client.post("/normalise-batch", content=b"xx",
+                    headers={"Content-Type": "application/json", "Content-Encoding": "br"})
+    assert r.status_code == 415
+
+
+@pytest.mark.integration
+def test_corrupt_gzip_body(client: TestClient):
+    r = client.post("/normalise-batch", content=b"definitely not gzip",
+                    headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+    assert r.status_code == 400
+
+
+@pytest.mark.integration
+def test_decompression_bomb_rejected():
+    """A tiny gzip body that expands past the limit fails with 413 (buffered) or an error line (stream)."""
+    import gzip
+    from app.middleware import ContentEncodingMiddleware
+    guarded = ContentEncodingMiddleware(app, max_body_bytes=64 * 1024, stream_paths=("/normalise-stream",))
+    bomb = gzip.compress(b"[" + b" " * (10 * 1024 * 1024) + b"]")
+    assert len(bomb) < 64 * 1024
+    with TestClient(guarded) as c:
+        r = c.post("/normalise-batch", content=bomb,
+                   headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+        assert r.status_code == 413
+        r = c.post("/normalise-stream", content=gzip.compress(b"GOTHAM -RPT\n" * 100000),
+                   headers={"Content-Encoding": "gzip"})
+        assert r.status_code == 200
+        assert "exceeds" in json.loads(r.text.splitlines()[-1])["error"]
+
+
+# ---------------------------
+# Bulk job API
+# ---------------------------
+
+@pytest.mark.integration
+def test_job_lifecycle(client: TestClient):
+    import time
+    n = 12000
+    body = "".join(f"TITLE{i} -RPT\n" for i in range(n))
+    r = client.post("/jobs", content=body, headers={"Content-Type": "text/plain"})
+    assert r.status_code == 202
+    job_id = r.json()["job_id"]
+    assert r.headers["location"] == f"/jobs/{job_id}"
+
+    deadline = time.monotonic() + 30
+    while (info := client.get(f"/jobs/{job_id}").json())["status"] != "done":
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert info["lines"] == info["rows"] == n and info["progress"] == 1.0
+
+    r = client.get(f"/jobs/{job_id}/results", params={"offset": n - 5, "limit": 10})
+    page = r.json()
+    assert page["results"][-1] == {"clean_title": f"TITLE{n - 1}"}
+    assert len(page["results"]) == 5 and page["next_offset"] is None
+    assert client.get(f"/jobs/{job_id}/results", params={"limit": 2}).json()["next_offset"] == 2
+
+    lines = client.get(f"/jobs/{job_id}/results/stream").text.splitlines()
+    assert len(lines) == n
+
+    metrics = client.get("/metrics").text
+    assert 'normalise_jobs_finished_total{status="done"}' in metrics
+    assert "normalise_job_rows_per_second_count" in metrics
+    assert "normalise_jobs_queued" in metrics
+
+    assert client.delete(f"/jobs/{job_id}").status_code == 204
+    assert client.get(f"/jobs/{job_id}").status_code == 404
+    assert client.delete(f"/jobs/{job_id}").status_code == 404
+
+
+@pytest.mark.integration
+def test_job_queue_full(client: TestClient, monkeypatch):
+    from app.main import JOBS
+    monkeypatch.setattr(JOBS, "max_queued", 0)
+    r = client.post("/jobs", content="A\n")
+    assert r.status_code == 429
+
+
+@pytest.mark.integration
+def test_per_worker_endpoints_refused_with_several_workers(client: TestClient, admin, monkeypatch):
+    """Jobs and admin writes would only reach the worker that answers, so they get 409."""
+    monkeypatch.setattr("app.main.SERVE_WORKERS", 2)
+    assert client.post("/jobs", content="A -RPT\n").status_code == 409
+    for path in ("/jobs/abc", "/jobs/abc/results", "/jobs/abc/results/stream"):
+        assert client.get(path).status_code == 409
+    assert client.delete("/jobs/abc").status_code == 409
+    assert client.put("/admin/rules", json={"version": "x", "rules": []}, headers=admin).status_code == 409
+    assert client.post("/admin/rules/reload", headers=admin).status_code == 409
+    assert client.post("/admin/catalogue", json={"entries": []}, headers=admin).status_code == 409
+    # Reads of per-worker state still answer, as does the admin token check
+    assert client.get("/admin/rules", headers=admin).status_code == 200
+    assert client.put("/admin/rules", json={}).status_code == 401
+    assert client.post("/normalise", json={"messy_title": "A -RPT"}).status_code == 200
+
+
+# ---------------------------
+# Precomputed title index
+# ---------------------------
+
+@pytest.mark.integration
+def test_title_index_answers_and_is_exported(client: TestClient, tmp_path, monkeypatch):
+    from app import model
+    from app.lookup import TitleIndex, write_index
+    path = tmp_path / "titles.idx"
+    write_index(path, [("INDEXED TITLE -RPT", "INDEXED TITLE")], {"ruleset": model.get_engine().version})
+    monkeypatch.setattr(model, "_INDEX", TitleIndex(path))
+    r = client.post("/normalise", json={"messy_title": "INDEXED TITLE -RPT"})
+    assert r.json() == {"clean_title": "INDEXED TITLE"}
+    metrics = client.get("/metrics").text
+    assert "normalise_index_entries 1.0" in metrics
+    assert "normalise_index_active 1.0" in metrics
+
+
+# ---------------------------
+# Catalogue matching
+# ---------------------------
+
+@pytest.mark.integration
+def test_match_endpoints(client: TestClient, admin, monkeypatch):
+    from app.matching import CatalogueIndex
+    monkeypatch.setattr("app.main.CATALOGUE_INDEX", CatalogueIndex())
+    assert client.post("/match", json={"messy_title": "GOTHAM"}).status_code == 503
+
+    r = client.post("/admin/catalogue", json={"entries": [
+        {"id": "c1", "title": "COLIN AND JUSTIN'S HOME HEIST"},
+        {"id": "c2", "title": "GOTHAM"},
+    ]}, headers=admin)
+    assert r.json() == {"inserted": 2, "size": 2}
+    assert client.post("/admin/catalogue", json={"entries": []}).status_code in (401, 403)
+
+    r = client.post("/match", json={"messy_title": "COLIN & JUSTIN'S HOME HEIST -PM"})
+    assert r.status_code == 200
+    assert r.json() == {"clean_title": "COLIN & JUSTIN'S HOME HEIST",
+                        "match": {"canonical_id": "c1", "canonical_title": "COLIN AND JUSTIN'S HOME HEIST",
+                                  "score": 1.0}}
+
+    r = client.post("/match-batch", json={"messy_titles": ["GOTHAM -RPT", "UNRELATED XYZ", "GOTHAM -RPT"]})
+    matches = r.json()["matches"]
+    assert [m["match"] and m["match"]["canonical_id"] for m in matches] == ["c2", None, "c2"]
+    assert "normalise_catalogue_size 2.0" in client.get("/metrics").text
+
+
+# ---------------------------
+# Load-test harness (in-process)
+# ---------------------------
+
+@pytest.mark.integration
+def test_load_harness_against_app():
+    import asyncio
+    import httpx
+    from benchmarks.loadtest import run_load, synthetic_requests
+
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await run_load(client, synthetic_requests(50, batch_ratio=0.2, batch_size=10), concurrency=4)
+
+    report = asyncio.run(go())
+    assert report["requests"] == 50 and report["errors"] == 0
+    assert set(report["by_path"]) == {"/normalise", "/normalise-batch"}
+    assert report["latency_ms"]["p99"] >= report["latency_ms"]["p50"] > 0
+
+
+# ---------------------------
+# Multi-worker metrics
+# ---------------------------
+
+@pytest.mark.integration
+def test_multiprocess_metrics_mode(tmp_path):
+    """With PROMETHEUS_MULTIPROC_DIR set, /metrics aggregates the shared files and snapshots."""
+    import subprocess
+    import sys
+    script = (
+        "from fastapi.testclient import TestClient\n"
+        "from app.main import app\n"
+        "c = TestClient(app)\n"
+        "for i in range(5): c.post('/normalise', json={'messy_title': f'T{i} -RPT'})\n"
+        "print(c.get('/metrics').text)\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    out = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True, check=True,
+                         env={**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}).stdout
+    assert 'http_requests_total{method="POST",path="/normalise",status="200"} 5.0' in out
+    assert "normalise_cache_misses_total 5.0" in out
+    assert 'normaliser_rule_pack_info{hash="' in out and 'pid="' in out
+    assert any(name.startswith("snapshot_") for name in os.listdir(tmp_path))
+
+
+# ---------------------------
+# /normalise coalescing
+# ---------------------------
+
+@pytest.fixture
+def coalescer(monkeypatch):
+    from app import main
+    from app.coalesce import Coalescer
+    c = Coalescer(main._normalise_key, max_batch=8, max_wait=0.005)
+    monkeypatch.setattr(main, "COALESCER", c)
+    return c
+
+
+@pytest.mark.integration
+def test_coalesced_normalise_matches_direct_results(client: TestClient, coalescer):
+    import asyncio
+    import httpx
+    from app.model import TITLE_CACHE, normalise_many
+    TITLE_CACHE.clear()
+    titles = [f"COALESCE {i % 5} -RPT" for i in range(40)]
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            responses = await asyncio.gather(*(c.post("/normalise", json={"messy_title": t}) for t in titles))
+        return [r.json()["clean_title"] for r in responses]
+
+    assert asyncio.run(scenario()) == normalise_many(titles)
+    stats = coalescer.stats
+    assert stats["requests"] == 40 and stats["computed"] <= 5
+    # Cache hits never reach the coalescer
+    requests = stats["requests"]
+    assert client.post("/normalise", json={"messy_title": titles[0]}).json()["clean_title"] == normalise_many(titles[:1])[0]
+    assert stats["requests"] == requests
+
+    text = client.get("/metrics").text
+    assert "normalise_coalesce_requests_total" in text
+    assert "normalise_coalesce_ratio" in text
+    assert 'normalise_coalesce_batch_fill_bucket{le="1.0"}' in text
+    assert 'normalise_coalesce_batch_size_bucket{le="8"}' in text
+
+
+@pytest.mark.integration
+def test_coalesced_normalise_internal_error(client: TestClient, coalescer, monkeypatch):
+    def boom(*_args, **_kwargs):
+        raise RuntimeError("kaboom")
+
+    monkeypatch.setattr("app.main.normalise_title", boom, raising=True)
+    r = client.post("/normalise", json={"messy_title": "NEVER SEEN BEFORE -RPT"})
+    assert r.status_code == 500
+    assert "kaboom" in r.json()["detail"]
+
+
+# ---------------------------
+# /normalise-batch admission control
+# ---------------------------
+
+def _run_with_budget_held(controller, titles_held, *calls):
+    """Send (method, path, json) calls while `titles_held` of the admission budget is taken."""
+    import asyncio
+    import httpx
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            async with controller.admit(titles_held):
+                return [await c.request(method, path, json=body) for method, path, body in calls]
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.integration
+def test_batch_rejected_with_retry_after_when_queue_full(client: TestClient, monkeypatch):
+    from app import main
+    from app.admission import AdmissionController
+    controller = AdmissionController(max_titles=10, max_queue=0)
+    monkeypatch.setattr(main, "ADMISSION", controller)
+
+    batch, single, metrics = _run_with_budget_held(
+        controller, 10,
+        ("POST", "/normalise-batch", {"messy_titles": ["A -RPT", "B -RPT"]}),
+        ("POST", "/normalise", {"messy_title": "A -RPT"}),
+        ("GET", "/metrics", None),
+    )
+    assert batch.status_code == 429
+    assert int(batch.headers["Retry-After"]) >= 1
+    assert "queue is full" in batch.json()["detail"]
+    # Single titles and scrapes do not go through admission
+    assert single.status_code == 200 and single.json()["clean_title"] == "A"
+    assert metrics.status_code == 200
+    assert "normalise_admission_in_flight_titles 10.0" in metrics.text
+    assert 'normalise_admission_rejected_total{reason="queue_full"} 1.0' in metrics.text
+
+    # With the budget free again the batch goes through
+    r = client.post("/normalise-batch", json={"messy_titles": ["A -RPT", "B -RPT"]})
+    assert r.status_code == 200 and r.json()["clean_titles"] == ["A", "B"]
+    assert "normalise_admission_wait_seconds_count" in client.get("/metrics").text
+
+
+@pytest.mark.integration
+def test_batch_refused_before_body_is_read(monkeypatch):
+    """With the queue full a batch is refused without reading (or parsing) its body."""
+    import asyncio
+    from app import main
+    from app.admission import AdmissionController
+    controller = AdmissionController(max_titles=10, max_queue=0)
+    monkeypatch.setattr(main, "ADMISSION", controller)
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+             "scheme": "http", "path": "/normalise-batch", "raw_path": b"/normalise-batch",
+             "query_string": b"", "root_path": "", "headers": [(b"content-type", b"application/json")],
+             "client": ("127.0.0.1", 1), "server": ("testserver", 80)}
+    reads, sent = [], []
+
+    async def receive():
+        reads.append(1)
+        return {"type": "http.request", "body": b'{"messy_titles": ["A"]}', "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    async def scenario():
+        async with controller.admit(10):
+            await app(scope, receive, send)
+
+    asyncio.run(scenario())
+    assert sent[0]["status"] == 429 and reads == []
+    assert controller.rejected["queue_full"] == 1
+
+
+@pytest.mark.integration
+def test_batch_validation_errors_unchanged(client: TestClient):
+    """The batch body is validated by hand; errors keep FastAPI's 422 format."""
+    r = client.post("/normalise-batch", json={"messy_titles": [1]})
+    assert r.status_code == 422 and r.json()["detail"][0]["loc"] == ["body", "messy_titles", 0]
+    assert client.post("/normalise-batch", json={}).status_code == 422
+    assert client.post("/normalise-batch", content=b"{bad", headers={"Content-Type": "application/json"}).status_code == 422
+    assert client.post("/normalise-batch", content=b"").status_code == 422
+    body = b'{"messy_titles": ["A"]}'
+    r = client.post("/normalise-batch", content=body, headers={"Content-Type": "text/plain"})
+    assert r.status_code == 422
+    assert r.json()["detail"] == [{"type": "model_attributes_type", "loc": ["body"],
+                                   "msg": "Input should be a valid dictionary or object to extract fields from",
+                                   "input": body.decode()}]
+    for content_type in ("application/json; charset=utf-8", "application/vnd.titles+json"):
+        assert client.post("/normalise-batch", content=body, headers={"Content-Type": content_type}).status_code == 200
+    assert client.post("/normalise-batch", content=body, headers={"Content-Type": ""}).status_code == 200
+    schema = app.openapi()["paths"]["/normalise-batch"]["post"]["requestBody"]["content"]["application/json"]
+    assert schema["schema"] == {"$ref": "#/components/schemas/BatchTitleRequest"}
+
+
+@pytest.mark.integration
+def test_batch_rejected_with_503_after_waiting(client: TestClient, monkeypatch):
+    from app import main
+    from app.admission import AdmissionController
+    controller = AdmissionController(max_titles=10, max_queue=4, max_wait=0.02)
+    monkeypatch.setattr(main, "ADMISSION", controller)
+
+    (r,) = _run_with_budget_held(controller, 10, ("POST", "/normalise-batch", {"messy_titles": ["A"]}))
+    assert r.status_code == 503
+    assert "Retry-After" in r.headers
+    assert controller.rejected["timeout"] == 1 and controller.queue_depth == 0
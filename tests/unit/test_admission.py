@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+from app.admission import AdmissionController, Rejected
+
+# ---------------------------
+# Unit tests for title-budget admission control
+# ---------------------------
+
+
+@pytest.mark.unit
+def test_admits_within_budget_and_queues_the_rest_fifo():
+    controller = AdmissionController(max_titles=10, max_queue=4, max_wait=1)
+    order = []
+
+    async def request(name, titles, hold):
+        async with controller.admit(titles):
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def scenario():
+        first = asyncio.ensure_future(request("a", 8, 0.05))
+        await asyncio.sleep(0)
+        assert controller.in_flight == 8
+        # "b" does not fit; "c" would, but must not overtake "b"
+        rest = [asyncio.ensure_future(request("b", 5, 0)), asyncio.ensure_future(request("c", 1, 0))]
+        await asyncio.sleep(0.01)
+        assert controller.queue_depth == 2 and controller.queued_titles == 6
+        await asyncio.gather(first, *rest)
+
+    asyncio.run(scenario())
+    assert order == ["a", "b", "c"]
+    assert controller.in_flight == 0 and controller.queue_depth == 0
+    assert controller.admitted == 3
+
+
+@pytest.mark.unit
+def test_full_queue_is_rejected_with_429():
+    controller = AdmissionController(max_titles=5, max_queue=1, max_wait=1)
+
+    async def scenario():
+        async with controller.admit(5):
+            waiting = asyncio.ensure_future(controller.admit(1).__aenter__())
+            await asyncio.sleep(0)
+            with pytest.raises(Rejected) as info:
+                async with controller.admit(1):
+                    pass
+            waiting.cancel()
+            return info.value
+
+    rejected = asyncio.run(scenario())
+    assert (rejected.status_code, rejected.reason) == (429, "queue_full")
+    assert rejected.retry_after >= 1
+    assert controller.rejected == {"queue_full": 1, "timeout": 0}
+    assert controller.queue_depth == 0 and controller.in_flight == 0
+
+
+@pytest.mark.unit
+def test_check_queue_refuses_only_when_any_request_would_be():
+    controller = AdmissionController(max_titles=5, max_queue=1, max_wait=1)
+
+    async def scenario():
+        controller.check_queue()  # idle
+        async with controller.admit(5):
+            controller.check_queue()  # budget taken, but there is room to wait
+            waiting = asyncio.ensure_future(controller.admit(1).__aenter__())
+            await asyncio.sleep(0)
+            with pytest.raises(Rejected):
+                controller.check_queue()
+            waiting.cancel()
+
+    asyncio.run(scenario())
+    assert controller.rejected["queue_full"] == 1
+    # With no queue at all, only a spent budget refuses up front
+    unqueued = AdmissionController(max_titles=5, max_queue=0)
+    unqueued.check_queue()
+    unqueued.in_flight = 5
+    with pytest.raises(Rejected):
+        unqueued.check_queue()
+
+
+@pytest.mark.unit
+def test_wait_timeout_is_rejected_with_503_and_frees_the_queue():
+    controller = AdmissionController(max_titles=5, max_queue=4, max_wait=0.02)
+
+    async def scenario():
+        async with controller.admit(5):
+            with pytest.raises(Rejected) as info:
+                async with controller.admit(2):
+                    pass
+            assert controller.queue_depth == 0 and controller.queued_titles == 0
+            return info.value
+
+    rejected = asyncio.run(scenario())
+    assert (rejected.status_code, rejected.reason) == (503, "timeout")
+    assert controller.rejected["timeout"] == 1
+
+
+@pytest.mark.unit
+def test_oversized_request_runs_alone():
+    controller = AdmissionController(max_titles=10, max_queue=0)
+
+    async def scenario():
+        async with controller.admit(1000):
+            assert controller.in_flight == 10
+            with pytest.raises(Rejected):
+                async with controller.admit(1):
+                    pass
+
+    asyncio.run(scenario())
+    assert controller.in_flight == 0
+
+
+@pytest.mark.unit
+def test_retry_after_follows_completion_rate():
+    controller = AdmissionController(max_titles=100, max_queue=0)
+    assert controller.retry_after() == 1
+
+    async def scenario():
+        for _ in range(10):
+            async with controller.admit(100):
+                pass
+        # 1000 titles done in the 10s window: 100/s, with 100 in flight -> 1s
+        async with controller.admit(100):
+            return controller.retry_after()
+
+    assert asyncio.run(scenario()) == 1
+    # 1100 titles done: 110/s, 5000 ahead -> 46s
+    controller.in_flight = 5000
+    assert controller.retry_after() == 46
+    controller.in_flight = 10 ** 6
+    assert controller.retry_after() == 60
+
+
+@pytest.mark.unit
+def test_invalid_limits():
+    with pytest.raises(ValueError):
+        AdmissionController(max_titles=0)
+    with pytest.raises(ValueError):
+        AdmissionController(max_titles=1, max_queue=-1)
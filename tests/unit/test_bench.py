@@ -0,0 +1,84 @@
+import pytest
+from benchmarks.bench_normaliser import bench_rules, compare, count_passes, stacked_titles
+
+# ---------------------------
+# Unit tests for benchmark helpers
+# ---------------------------
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "title,passes",
+    [("ALREADY CLEAN", 1), ("GOTHAM -RPT", 2), ("SHOW S01 E02 -POST MATCH [LIVE]", 3)],
+)
+def test_count_passes(title, passes):
+    assert count_passes(title) == passes
+
+
+@pytest.mark.unit
+def test_stacked_titles_are_deterministic():
+    assert stacked_titles(5, count=3) == stacked_titles(5, count=3)
+    assert len(stacked_titles(5, count=3)) == 3
+
+
+@pytest.mark.unit
+def test_bench_rules_uses_engine_matchers():
+    results = bench_rules(["GOTHAM -RPT", "M- SHOW", "CLEAN"], repeat=1)
+    assert [r["rule"] for r in results] == list(range(13))
+    by_rule = {r["rule"]: r for r in results}
+    assert by_rule[4]["matches"] == 1 and by_rule[4]["kind"] == "suffix"   # ' -RPT'
+    assert by_rule[12]["matches"] == 1 and by_rule[12]["kind"] == "prefix"  # 'M- '
+
+
+@pytest.mark.unit
+def test_compare_flags_only_regressions_beyond_threshold():
+    baseline = {"datasets": {"corpus": {"engine_titles_per_second": 1000, "mean_peak_bytes_per_title": 100}}}
+    ok = {"datasets": {"corpus": {"engine_titles_per_second": 850, "mean_peak_bytes_per_title": 115}}}
+    slow = {"datasets": {"corpus": {"engine_titles_per_second": 700, "mean_peak_bytes_per_title": 130}}}
+    assert compare(ok, baseline, 0.2) == []
+    assert len(compare(slow, baseline, 0.2)) == 2
+
+
+# ---------------------------
+# Unit tests for the load-test harness
+# ---------------------------
+
+@pytest.mark.unit
+def test_percentile_nearest_rank():
+    from benchmarks.loadtest import percentile
+    values = [i / 100 for i in range(1, 101)]
+    assert percentile(values, 50) == 0.5
+    assert percentile(values, 99) == 0.99
+    assert percentile([0.1], 95) == 0.1
+    assert percentile([], 50) == 0.0
+
+
+@pytest.mark.unit
+def test_load_trace(tmp_path):
+    from benchmarks.loadtest import load_trace
+    path = tmp_path / "trace.jsonl"
+    path.write_text('{"path": "/normalise", "body": {"messy_title": "A"}}\n\n'
+                    '{"method": "get", "path": "/metrics"}\n', encoding="utf-8")
+    assert load_trace(path) == [("POST", "/normalise", {"messy_title": "A"}), ("GET", "/metrics", None)]
+    path.write_text('{"method": "GET"}\n', encoding="utf-8")
+    with pytest.raises(ValueError, match=":1:"):
+        load_trace(path)
+
+
+@pytest.mark.unit
+def test_synthetic_requests_mix():
+    from benchmarks.loadtest import synthetic_requests
+    requests = synthetic_requests(1000, batch_ratio=0.2, batch_size=5)
+    batches = [r for r in requests if r[1] == "/normalise-batch"]
+    assert 100 < len(batches) < 300
+    assert all(len(r[2]["messy_titles"]) == 5 for r in batches)
+
+
+@pytest.mark.unit
+def test_summarise_counts_errors_per_path():
+    from benchmarks.loadtest import summarise
+    samples = [("/normalise", 200, 0.01)] * 8 + [("/normalise", 0, 0.5), ("/normalise-batch", 503, 0.2)]
+    report = summarise(samples, elapsed=2.0)
+    assert report["requests"] == 10 and report["errors"] == 2 and report["error_rate"] == 0.2
+    assert report["throughput_rps"] == 5.0
+    assert report["status_codes"] == {"0": 1, "200": 8, "503": 1}
+    assert report["by_path"]["/normalise"]["latency_ms"]["p50"] == 10.0
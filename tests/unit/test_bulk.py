@@ -0,0 +1,62 @@
+import csv
+
+import pytest
+from app.bulk import main, run, split_ranges
+
+# ---------------------------
+# Unit tests for the bulk CLI
+# ---------------------------
+
+@pytest.mark.unit
+@pytest.mark.parametrize("workers", [1, 2])
+def test_bulk_csv_preserves_order_and_columns(tmp_path, workers):
+    src = tmp_path / "in.csv"
+    with src.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["id", "title", "channel"])
+        for i in range(50):
+            w.writerow([i, f"SHOW {i % 7} -RPT", "SEVEN"])
+        w.writerow([50, "MURDER, SHE WROTE -PM", "NINE\nGEM"])  # quoted newline
+    dst = tmp_path / "out.csv"
+
+    stats = run(str(src), str(dst), column=1, header=True, workers=workers, chunk_bytes=64)
+
+    with dst.open(newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["id", "title", "clean_title", "channel"]
+    assert rows[1] == ["0", "SHOW 0 -RPT", "SHOW", "SEVEN"]
+    assert rows[-1] == ["50", "MURDER, SHE WROTE -PM", "MURDER, SHE WROTE", "NINE\nGEM"]
+    assert len(rows) == 52
+    assert [row[1] for row in rows[1:51]] == [f"SHOW {i % 7} -RPT" for i in range(50)]
+    assert stats["rows"] == 51 and stats["chunks"] > 1
+
+
+@pytest.mark.unit
+def test_split_ranges_cut_at_newlines_outside_quotes(tmp_path):
+    src = tmp_path / "in.csv"
+    data = b'a,"x\ny\nz"\nb,c\n' * 20
+    src.write_bytes(data)
+    ranges = split_ranges(str(src), chunk_bytes=5)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    # every range holds whole records
+    assert len(ranges) > 1
+    assert all(data[start:end].count(b'"') % 2 == 0 for start, end in ranges)
+    assert split_ranges(str(src), chunk_bytes=5, quoted=False) != ranges
+
+
+@pytest.mark.unit
+def test_bulk_main_text_input(tmp_path, capsys):
+    src = tmp_path / "titles.txt"
+    src.write_text("GOTHAM -RPT\r\nHOT SEAT -5PM\nGOTHAM -RPT\n", encoding="utf-8")
+    dst = tmp_path / "out.csv"
+
+    assert main([str(src), str(dst), "--workers", "1"]) == 0
+
+    with dst.open(newline="", encoding="utf-8") as f:
+        assert list(csv.reader(f)) == [
+            ["GOTHAM -RPT", "GOTHAM"],
+            ["HOT SEAT -5PM", "HOT SEAT"],
+            ["GOTHAM -RPT", "GOTHAM"],
+        ]
+    assert "3 rows (2 titles normalised)" in capsys.readouterr().err
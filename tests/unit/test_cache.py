@@ -0,0 +1,45 @@
+import pytest
+from app.cache import LRUCache
+from app import model
+
+# ---------------------------
+# Unit tests for the LRU cache
+# ---------------------------
+
+@pytest.mark.unit
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1          # 'a' is now most recently used
+    cache.put("c", 3)                   # evicts 'b'
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats() == {"hits": 2, "misses": 1, "evictions": 1, "size": 2, "capacity": 2}
+
+
+@pytest.mark.unit
+def test_lru_cache_zero_capacity_disables_storage():
+    cache = LRUCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+@pytest.mark.unit
+def test_lru_cache_rejects_negative_capacity():
+    with pytest.raises(ValueError):
+        LRUCache(-1)
+
+
+@pytest.mark.unit
+def test_normalise_title_cache_is_keyed_by_ruleset_version(monkeypatch):
+    """A different rule set must never be answered from another rule set's entries."""
+    monkeypatch.setattr(model, "TITLE_CACHE", LRUCache(16))
+    assert model.normalise_title("GOTHAM -RPT") == "GOTHAM"
+    assert model.normalise_title("GOTHAM -RPT") == "GOTHAM"
+    assert model.TITLE_CACHE.stats()["hits"] == 1
+
+    no_rpt = [r for r in model.RULES if "RPT" not in r.pattern]
+    monkeypatch.setattr(model, "_ENGINE", model.RuleEngine(no_rpt))
+    assert model.normalise_title("GOTHAM -RPT") == "GOTHAM -RPT"
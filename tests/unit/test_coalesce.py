@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+import pytest
+from app.coalesce import Coalescer
+
+# ---------------------------
+# Unit tests for single-flight / micro-batch coalescing
+# ---------------------------
+
+
+class Recorder:
+    """compute() that records the keys it was called with."""
+
+    def __init__(self, delay=0.0, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.calls = []
+
+    def __call__(self, key):
+        self.calls.append(key)
+        time.sleep(self.delay)
+        if key in self.fail:
+            raise RuntimeError(f"bad {key}")
+        return key.upper()
+
+
+@pytest.mark.unit
+def test_same_key_is_computed_once():
+    compute = Recorder(delay=0.05)
+    coalescer = Coalescer(compute, max_batch=8, max_wait=0.01)
+
+    async def scenario():
+        return await asyncio.gather(*(coalescer.submit("a") for _ in range(10)))
+
+    assert asyncio.run(scenario()) == ["A"] * 10
+    assert compute.calls == ["a"]
+    assert coalescer.stats["requests"] == 10
+    assert coalescer.stats["shared"] == 9
+    assert coalescer.stats["computed"] == 1
+
+
+@pytest.mark.unit
+def test_distinct_keys_are_batched_while_a_batch_runs():
+    compute = Recorder(delay=0.02)
+    coalescer = Coalescer(compute, max_batch=4, max_wait=0.05)
+
+    async def scenario():
+        return await asyncio.gather(*(coalescer.submit(k) for k in "abcdefg"))
+
+    assert asyncio.run(scenario()) == list("ABCDEFG")
+    stats = coalescer.stats
+    # "a" goes at once (nothing running), "b".."e" fill a batch, "f", "g" go when a batch finishes
+    assert stats["flushes"]["idle"] >= 1 and stats["flushes"]["size"] == 1
+    assert stats["batch_sizes"][4] == 1
+    assert sum(n * c for n, c in enumerate(stats["batch_sizes"])) == 7 == stats["computed"]
+
+
+@pytest.mark.unit
+def test_added_latency_is_bounded_by_max_wait():
+    compute = Recorder(delay=0.3)
+    coalescer = Coalescer(compute, max_batch=100, max_wait=0.02)
+
+    async def scenario():
+        slow = asyncio.ensure_future(coalescer.submit("slow"))
+        await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        # Waits for its timer, not for the running batch to finish
+        task = asyncio.ensure_future(coalescer.submit("x"))
+        while not compute.calls.count("x"):
+            await asyncio.sleep(0.001)
+        waited = time.perf_counter() - start
+        await asyncio.gather(slow, task)
+        return waited
+
+    assert asyncio.run(scenario()) < 0.2
+    assert coalescer.stats["flushes"]["timer"] == 1
+
+
+@pytest.mark.unit
+def test_errors_reach_only_their_callers():
+    coalescer = Coalescer(Recorder(fail={"bad"}), max_batch=4, max_wait=0.01)
+
+    async def scenario():
+        return await asyncio.gather(coalescer.submit("ok"), coalescer.submit("bad"), return_exceptions=True)
+
+    ok, bad = asyncio.run(scenario())
+    assert ok == "OK"
+    assert isinstance(bad, RuntimeError)
+
+
+@pytest.mark.unit
+def test_cancelled_caller_does_not_cancel_shared_work():
+    coalescer = Coalescer(Recorder(delay=0.05), max_batch=4, max_wait=0.01)
+
+    async def scenario():
+        first = asyncio.ensure_future(coalescer.submit("a"))
+        second = asyncio.ensure_future(coalescer.submit("a"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "A"
+
+
+@pytest.mark.unit
+def test_invalid_limits():
+    with pytest.raises(ValueError):
+        Coalescer(str.upper, max_batch=0)
+    with pytest.raises(ValueError):
+        Coalescer(str.upper, max_wait=-1)
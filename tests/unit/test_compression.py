@@ -0,0 +1,76 @@
+import gzip
+import zlib
+
+import pytest
+from app.compression import (
+    PIECE_SIZE,
+    DecompressionError,
+    GzipDecoder,
+    GzipEncoder,
+    choose_encoding,
+)
+
+# ---------------------------
+# Unit tests for body codecs
+# ---------------------------
+
+def _decode(decoder, chunks):
+    out = [piece for chunk in chunks for piece in decoder.decompress(chunk)]
+    decoder.finish()
+    return out
+
+
+@pytest.mark.unit
+def test_gzip_decoder_bounds_each_piece():
+    raw = b"A" * (PIECE_SIZE * 5 + 7)
+    pieces = _decode(GzipDecoder(), [gzip.compress(raw)])
+    assert b"".join(pieces) == raw
+    assert max(len(p) for p in pieces) <= PIECE_SIZE
+
+
+@pytest.mark.unit
+def test_gzip_decoder_accepts_split_input_and_multiple_members():
+    data = gzip.compress(b"GOTHAM -RPT\n") + gzip.compress(b"HOT SEAT -5PM\n")
+    chunks = [data[i:i + 3] for i in range(0, len(data), 3)]
+    assert b"".join(_decode(GzipDecoder(), chunks)) == b"GOTHAM -RPT\nHOT SEAT -5PM\n"
+
+
+@pytest.mark.unit
+def test_gzip_decoder_rejects_corrupt_and_truncated_input():
+    with pytest.raises(DecompressionError):
+        _decode(GzipDecoder(), [b"not gzip at all"])
+    with pytest.raises(DecompressionError):
+        _decode(GzipDecoder(), [gzip.compress(b"GOTHAM" * 100)[:-10]])
+
+
+@pytest.mark.unit
+def test_gzip_encoder_flushes_streamed_chunks():
+    encoder = GzipEncoder(6)
+    d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert d.decompress(encoder.compress(b'{"clean_title": "GOTHAM"}\n', final=False)) == b'{"clean_title": "GOTHAM"}\n'
+    d.decompress(encoder.compress(b"", final=True))
+    assert d.eof
+
+
+@pytest.mark.unit
+def test_zstd_round_trip():
+    zstandard = pytest.importorskip("zstandard")
+    from app.compression import ZstdDecoder, ZstdEncoder
+    encoder = ZstdEncoder(3)
+    data = encoder.compress(b"GOTHAM -RPT\n" * 1000, final=False) + encoder.compress(b"", final=True)
+    assert b"".join(_decode(ZstdDecoder(), [data])) == b"GOTHAM -RPT\n" * 1000
+    with pytest.raises(DecompressionError):
+        _decode(ZstdDecoder(), [zstandard.ZstdCompressor().compress(b"GOTHAM" * 100)[:-4]])
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("header, expected", [
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("deflate, gzip;q=0.5", "gzip"),
+    ("gzip;q=0", None),
+    ("br", None),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+from app.jobs import DONE, QUEUED, JobManager, JobQueueFull
+from app.model import normalise_title
+
+# ---------------------------
+# Unit tests for bulk jobs
+# ---------------------------
+
+async def _agen(items):
+    for item in items:
+        yield item
+
+
+def _wait(job, timeout=10):
+    deadline = time.monotonic() + timeout
+    while job.status in (QUEUED, "running"):
+        assert time.monotonic() < deadline, "job did not finish"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    m = JobManager(str(tmp_path), chunk_size=7, normalise=normalise_title)
+    yield m
+    m.close()
+
+
+@pytest.mark.unit
+def test_job_spools_normalises_and_pages(manager):
+    body = "".join(f"TITLE{i} -RPT\n" for i in range(50)).encode()
+    job = asyncio.run(manager.submit(_agen([body[:13], body[13:]]), ndjson=False))
+    _wait(job)
+    assert job.status == DONE
+    assert (job.lines, job.lines_done, job.rows) == (50, 50, 50)
+    assert not os.path.exists(job.input_path)
+
+    page = [json.loads(r) for r in manager.read_rows(job, 10, 12)]
+    assert page == [{"clean_title": f"TITLE{i}"} for i in range(10, 22)]
+    assert len(manager.read_rows(job, 45, 100)) == 5
+    assert manager.read_rows(job, 50, 10) == []
+
+    async def collect():
+        return b"".join([chunk async for chunk in manager.iter_results(job, block_size=16)])
+    lines = asyncio.run(collect()).splitlines()
+    assert [json.loads(line)["clean_title"] for line in lines] == [f"TITLE{i}" for i in range(50)]
+
+
+@pytest.mark.unit
+def test_job_ndjson_errors_keep_line_numbers(manager):
+    body = b'"A -RPT"\n\n42\n{"messy_title": "B (R)"}\n'
+    job = asyncio.run(manager.submit(_agen([body]), ndjson=True))
+    _wait(job)
+    rows = [json.loads(r) for r in manager.read_rows(job, 0, 10)]
+    assert rows[0] == {"clean_title": "A"}
+    assert rows[1]["line"] == 3 and "error" in rows[1]
+    assert rows[2] == {"clean_title": "B"}
+
+
+@pytest.mark.unit
+def test_queue_limit_and_delete(tmp_path):
+    m = JobManager(str(tmp_path), max_queued=0, normalise=normalise_title)
+    try:
+        with pytest.raises(JobQueueFull):
+            asyncio.run(m.submit(_agen([b"A\n"]), ndjson=False))
+        m.max_queued = 10
+        job = asyncio.run(m.submit(_agen([b"A\n"]), ndjson=False))
+        _wait(job)
+        assert m.delete(job.id)
+        assert m.get(job.id) is None
+        assert not os.path.exists(job.output_path)
+        assert not m.delete(job.id)
+    finally:
+        m.close()
+    assert not os.listdir(tmp_path)
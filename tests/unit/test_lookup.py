@@ -0,0 +1,76 @@
+import pytest
+from app import model
+from app.lookup import TitleIndex, build, load_title_index, main, write_index
+from app.rulepacks import parse_rule_pack
+
+# ---------------------------
+# Unit tests for the title index
+# ---------------------------
+
+TITLES = ["GOTHAM -RPT", "HOT SEAT -5PM", "POKÉMON - ENCORE", "", "M- MOVIE (R)", "\ud800 odd"]
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    path = tmp_path / "titles.idx"
+    write_index(path, [(t, model.get_engine().normalise(t)) for t in TITLES],
+                {"ruleset": model.get_engine().version})
+    return path
+
+
+@pytest.mark.unit
+def test_index_round_trip(index_path):
+    index = TitleIndex(index_path)
+    assert len(index) == len(TITLES)
+    for title in TITLES:
+        assert index.get(title) == model.get_engine().normalise(title)
+    assert index.get("NOT INDEXED") is None
+    assert (index.hits, index.misses) == (len(TITLES), 1)
+    index.close()
+
+
+@pytest.mark.unit
+def test_build_from_corpus_files(tmp_path):
+    csv_path = tmp_path / "a.csv"
+    csv_path.write_text("title,channel\nGOTHAM -RPT,1\nHOT SEAT -5PM,2\nGOTHAM -RPT,3\n", encoding="utf-8")
+    txt_path = tmp_path / "b.txt"
+    txt_path.write_text("MIXOLOGY-EARLY(R)\n", encoding="utf-8")
+    out = tmp_path / "out.idx"
+    stats = build([str(csv_path), str(txt_path)], str(out), header=False)
+    assert stats["entries"] == 4  # header row is a title too without --header
+    index = load_title_index(out)
+    assert index.get("MIXOLOGY-EARLY(R)") == "MIXOLOGY"
+    assert index.meta["sources"] == ["a.csv", "b.txt"]
+    index.close()
+    assert main(["info", str(out)]) == 0
+
+
+@pytest.mark.unit
+def test_index_rejected_for_other_rules(index_path):
+    other = parse_rule_pack({"version": "other", "rules": ["-RPT$"]})
+    with pytest.raises(ValueError, match="rule set"):
+        load_title_index(index_path, other)
+
+
+@pytest.mark.unit
+def test_invalid_index_file(tmp_path):
+    path = tmp_path / "bad.idx"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError, match="invalid title index"):
+        TitleIndex(path)
+
+
+@pytest.mark.unit
+def test_normalise_title_uses_index_only_for_its_rules(tmp_path, monkeypatch):
+    path = tmp_path / "fake.idx"
+    # A deliberately wrong answer shows where the result came from
+    write_index(path, [("GOTHAM -RPT", "FROM INDEX")], {"ruleset": model.get_engine().version})
+    monkeypatch.setattr(model, "_INDEX", TitleIndex(path))
+    model.TITLE_CACHE.clear()
+    try:
+        assert model.normalise_title("GOTHAM -RPT") == "FROM INDEX"
+        assert model.normalise_title("HOT SEAT -5PM") == "HOT SEAT"
+        monkeypatch.setattr(model, "_ENGINE", parse_rule_pack({"version": "x", "rules": ["-RPT$"]}))
+        assert model.normalise_title("GOTHAM -RPT") == "GOTHAM"
+    finally:
+        model.TITLE_CACHE.clear()
@@ -0,0 +1,73 @@
+import pytest
+from app.matching import CatalogueIndex, load_catalogue, match_key
+
+# ---------------------------
+# Unit tests for catalogue matching
+# ---------------------------
+
+@pytest.fixture
+def index():
+    idx = CatalogueIndex()
+    for canonical_id, title in [
+        ("c1", "COLIN AND JUSTIN'S HOME HEIST"),
+        ("c2", "THE AMAZING RACE"),
+        ("c3", "ANTIQUES ROADSHOW"),
+        ("c4", "POKÉMON"),
+    ]:
+        idx.add(canonical_id, title)
+    return idx
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("title, expected", [
+    ("COLIN & JUSTIN'S HOME HEIST", "COLIN AND JUSTINS HOME HEIST"),
+    ("Colin and Justins: Home-Heist", "COLIN AND JUSTINS HOME HEIST"),
+    ("POKÉMON", "POKEMON"),
+    ("", ""),
+])
+def test_match_key(title, expected):
+    assert match_key(title) == expected
+
+
+@pytest.mark.unit
+def test_variants_match_exactly(index):
+    for variant in ("COLIN & JUSTIN'S HOME HEIST", "COLIN AND JUSTINS HOME HEIST"):
+        assert index.match(variant) == {"canonical_id": "c1", "canonical_title": "COLIN AND JUSTIN'S HOME HEIST",
+                                        "score": 1.0}
+    assert index.match("POKEMON")["canonical_id"] == "c4"
+
+
+@pytest.mark.unit
+def test_fuzzy_match_and_threshold(index):
+    m = index.match("ANTIQUE ROADSHOW")
+    assert m["canonical_id"] == "c3" and 0.5 < m["score"] < 1
+    assert index.match("ZZZZ QQQQ", min_score=0.5) is None
+
+
+@pytest.mark.unit
+def test_incremental_insert_and_replace(index):
+    index.add("c5", "HOME AND AWAY")
+    assert index.match("HOME & AWAY")["canonical_id"] == "c5"
+    index.add("c5", "NEIGHBOURS")
+    assert len(index) == 5
+    assert index.match("HOME & AWAY", min_score=0.9) is None
+    assert index.match("NEIGHBOURS")["canonical_id"] == "c5"
+
+
+@pytest.mark.unit
+def test_common_trigrams_are_capped():
+    idx = CatalogueIndex(max_postings=50)
+    for i in range(500):
+        idx.add(f"s{i}", f"THE SHOW {i}")
+    idx.add("x", "THE XYLOPHONE SHOW")
+    assert idx.match("THE XYLOPHONE SHOWS")["canonical_id"] == "x"
+
+
+@pytest.mark.unit
+def test_load_catalogue(tmp_path):
+    path = tmp_path / "catalogue.csv"
+    path.write_text("id,title,year\nc1,GOTHAM,2014\n,MISSING ID,\n", encoding="utf-8")
+    assert len(load_catalogue(path)) == 1
+    path.write_text("name\nGOTHAM\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_catalogue(path)
@@ -1,5 +1,9 @@
+import csv
+import re
+from pathlib import Path
+
 import pytest
-from app.model import normalise_title
+from app.model import RULES, RuleEngine, apply_rules, normalise_title
 
 # ---------------------------
 # Unit tests for pure function
@@ -90,3 +94,85 @@ def test_normalise_title_only_noise_reduces_but_keeps_leading_tokens():
     """
     s = "M- S01 E02 -POST MATCH -RPT (R) 5PM"
     assert normalise_title(s) == "S01 E02"
+
+
+# ---------------------------
+# Compiled rule engine
+# ---------------------------
+
+CORPUS_PATH = Path(__file__).resolve().parents[2] / "program_names (2).csv"
+
+
+@pytest.mark.unit
+def test_engine_matches_regex_loop_on_corpus():
+    """The compiled engine must agree with plain `rule.sub` passes on every real title."""
+    with CORPUS_PATH.open(newline="", encoding="utf-8") as f:
+        titles = [row[0] for row in csv.reader(f) if row]
+    assert titles
+    mismatches = [t for t in titles if normalise_title(t) != apply_rules(RULES, t)]
+    assert mismatches == []
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "messy",
+    [
+        " M- RPT 5",            # leading space delays the prefix rule by one pass
+        "X -PART 2 RPT",        # rule order within a pass decides what survives
+        "X 5\n RPT",            # '$' before a trailing newline
+        "A\u00a0 5\u2003",      # non-ASCII whitespace is stripped between passes
+        "M- M- SHOW -RPT -RPT",
+    ],
+)
+def test_engine_matches_regex_loop_on_tricky_inputs(messy):
+    assert normalise_title(messy) == apply_rules(RULES, messy)
+
+
+@pytest.mark.unit
+def test_normalise_title_deeply_stacked_suffixes():
+    """Long noise tails are peeled iteratively, without hitting the recursion limit."""
+    assert normalise_title("SHOW" + " -RPT 5" * 5000) == "SHOW"
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("pattern", [r"RPT", r"^M- .*$", r" ?$", r"(?<=X) RPT$"])
+def test_rule_engine_rejects_unsupported_rules(pattern):
+    with pytest.raises(ValueError):
+        RuleEngine([re.compile(pattern)])
+
+
+@pytest.mark.unit
+def test_engine_trace_records_rule_indices_per_pass():
+    trace = []
+    assert RuleEngine(RULES).normalise("M- GOTHAM 2 -RPT", trace) == "GOTHAM"
+    # pass 1: ' -RPT' (4), ' 2' (11), 'M- ' (12); pass 2: nothing left to strip
+    assert trace == [[4, 11, 12], []]
+    reference = []
+    apply_rules(RULES, "M- GOTHAM 2 -RPT", reference)
+    assert reference == trace
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("title", ["M- GOTHAM 2 -RPT", "SHOW S01 E02 -POST MATCH [LIVE]", "CLEAN", "GOTHAM\n -RPT"])
+def test_engine_timed_path_matches_normalise(title):
+    engine = RuleEngine(RULES)
+    trace, timed_trace, timings = [], [], {}
+    assert engine.normalise_timed(title, timed_trace, timings) == engine.normalise(title, trace)
+    assert timed_trace == trace
+    if "\n" in title:
+        assert timings == {}  # left to the regex loop
+    else:
+        assert 0 in timings and 12 in timings and all(t > 0 for t in timings.values())
+
+
+@pytest.mark.unit
+def test_normalise_title_observer_sees_cache_misses_only(monkeypatch):
+    from app import model
+    seen = []
+    monkeypatch.setattr(model, "TITLE_CACHE", model.LRUCache(16))
+    monkeypatch.setattr(model, "_OBSERVER", None)
+    monkeypatch.setattr(model, "_SAMPLE", None)
+    model.set_observer(lambda engine, title, trace, timings: seen.append((title, len(trace))))
+    assert normalise_title("OBSERVED -RPT") == "OBSERVED"
+    assert normalise_title("OBSERVED -RPT") == "OBSERVED"
+    assert seen == [("OBSERVED -RPT", 2)]
@@ -0,0 +1,98 @@
+import os
+import threading
+
+import pytest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from app.multiproc import SnapshotCollector, write_snapshot
+from app import serve
+from app.serve import prepare_multiproc_dir
+
+# ---------------------------
+# Unit tests for multi-worker metric snapshots
+# ---------------------------
+
+DEAD_PID = 2 ** 22 + 12345  # above the default pid_max, so never a live process
+
+
+class FakeCollector:
+    def __init__(self, hits, size, version):
+        self.hits, self.size, self.version = hits, size, version
+
+    def collect(self):
+        yield CounterMetricFamily("cache_hits", "hits", value=self.hits)
+        yield GaugeMetricFamily("cache_size", "size", value=self.size)
+        info = GaugeMetricFamily("pack_info", "pack", labels=["version"])
+        info.add_metric([self.version], 1)
+        yield info
+        yield HistogramMetricFamily("passes", "passes", buckets=[("1", self.hits), ("+Inf", self.hits)],
+                                    sum_value=self.hits)
+
+
+def _samples(collector):
+    return {(s.name, tuple(sorted(s.labels.items()))): s.value for m in collector.collect() for s in m.samples}
+
+
+@pytest.mark.unit
+def test_snapshots_merge_across_workers(tmp_path):
+    me = os.getpid()
+    write_snapshot([FakeCollector(3, 10, "a")], str(tmp_path), pid=me)
+    write_snapshot([FakeCollector(4, 20, "b")], str(tmp_path), pid=DEAD_PID)
+    samples = _samples(SnapshotCollector(str(tmp_path), {"pack_info": "pid"}))
+    # counters and histograms of exited workers still count; their gauges do not
+    assert samples[("cache_hits_total", ())] == 7
+    assert samples[("passes_bucket", (("le", "+Inf"),))] == 7
+    assert samples[("passes_sum", ())] == 7
+    assert samples[("cache_size", ())] == 10
+    assert samples[("pack_info", (("pid", str(me)), ("version", "a")))] == 1
+    assert not any(k[0] == "pack_info" and ("version", "b") in k[1] for k in samples)
+
+
+@pytest.mark.unit
+def test_gauge_modes(tmp_path):
+    write_snapshot([FakeCollector(1, 10, "a")], str(tmp_path), pid=os.getpid())
+    write_snapshot([FakeCollector(1, 30, "a")], str(tmp_path), pid=os.getppid())
+    assert _samples(SnapshotCollector(str(tmp_path)))[("cache_size", ())] == 40
+    assert _samples(SnapshotCollector(str(tmp_path), {"cache_size": "max"}))[("cache_size", ())] == 30
+    assert _samples(SnapshotCollector(str(tmp_path), {"cache_size": "min"}))[("cache_size", ())] == 10
+
+
+@pytest.mark.unit
+def test_prepare_multiproc_dir_clears_stale_files(tmp_path):
+    (tmp_path / "counter_1.db").write_bytes(b"x")
+    (tmp_path / "snapshot_1.json").write_text("[]")
+    (tmp_path / "snapshot_1.abc123.tmp").write_text("[")
+    (tmp_path / "keep.txt").write_text("x")
+    prepare_multiproc_dir(str(tmp_path / "sub"))
+    prepare_multiproc_dir(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ["keep.txt", "sub"]
+
+
+@pytest.mark.unit
+def test_concurrent_snapshot_writes(tmp_path):
+    """A scrape and the periodic writer may write this process's snapshot at once."""
+    errors = []
+
+    def write():
+        for _ in range(200):
+            try:
+                write_snapshot([FakeCollector(1, 1, "a")], str(tmp_path))
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert os.listdir(tmp_path) == [f"snapshot_{os.getpid()}.json"]
+
+
+@pytest.mark.unit
+def test_serve_exports_worker_count(tmp_path, monkeypatch):
+    monkeypatch.setenv(serve.MULTIPROC_DIR_ENV, str(tmp_path))
+    monkeypatch.delenv(serve.WORKERS_ENV, raising=False)
+    runs = []
+    monkeypatch.setattr(serve.uvicorn, "run", lambda *args, **kwargs: runs.append(kwargs))
+    assert serve.main(["--workers", "3"]) == 0
+    assert runs[0]["workers"] == 3 and os.environ[serve.WORKERS_ENV] == "3"
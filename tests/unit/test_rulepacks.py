@@ -0,0 +1,100 @@
+import itertools
+import json
+from pathlib import Path
+
+import pytest
+from app import model
+from app.rulepacks import check_against_reference, load_rule_pack, main, parse_rule_pack
+
+# ---------------------------
+# Unit tests for rule packs
+# ---------------------------
+
+DEFAULT_PACK = Path(__file__).resolve().parents[2] / "rules" / "default.json"
+
+
+@pytest.mark.unit
+def test_default_pack_matches_builtin_rules():
+    """The shipped pack must stay in step with model.RULES."""
+    engine = load_rule_pack(DEFAULT_PACK)
+    assert engine.version == model.RuleEngine(model.RULES).version
+    assert engine.pack_version == "1.0"
+
+
+@pytest.mark.unit
+def test_parse_rule_pack_with_flags():
+    engine = parse_rule_pack({"version": "t1", "rules": [{"pattern": "[ -]+rpt$", "flags": ["IGNORECASE"]}]})
+    assert engine.normalise("Gotham -RPT") == "Gotham"
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "data",
+    [
+        [],
+        {"rules": [" RPT$"]},
+        {"version": "", "rules": [" RPT$"]},
+        {"version": "x", "rules": []},
+        {"version": "x", "rules": [42]},
+        {"version": "x", "rules": ["(unclosed$"]},
+        {"version": "x", "rules": ["RPT"]},                                   # not anchored
+        {"version": "x", "rules": [{"pattern": " RPT$", "flags": ["MULTILINE"]}]},
+    ],
+)
+def test_parse_rule_pack_rejects_invalid(data):
+    with pytest.raises(ValueError):
+        parse_rule_pack(data)
+
+
+@pytest.mark.unit
+def test_validate_cli(tmp_path, capsys):
+    bad = tmp_path / "bad.json"
+    bad.write_text(json.dumps({"version": "x", "rules": ["RPT"]}), encoding="utf-8")
+    assert main(["validate", str(DEFAULT_PACK)]) == 0
+    assert main(["validate", str(DEFAULT_PACK), str(bad)]) == 1
+    assert "FAIL" in capsys.readouterr().err
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "rules,title,expected",
+    [
+        (["( B| A B)$"], "C A B", "C"),       # a later alternative is longer
+        (["(B|BB)$", "AB$"], "ABB", "A"),     # a later rule then sees the wrong remainder
+        (["(X??Y)$"], "AXY", "A"),            # a lazy quantifier
+    ],
+)
+def test_packs_whose_reversed_match_is_shorter_match_re_sub(rules, title, expected):
+    engine = parse_rule_pack({"version": "t", "rules": rules})
+    assert [kind for kind, _ in engine.rule_matchers][0] == "search"
+    assert engine.normalise(title) == model.apply_rules(engine.rules, title) == expected
+    trace, timings = [], {}
+    assert engine.normalise_timed(title, trace, timings) == expected
+    titles = ["".join(p) for n in range(7) for p in itertools.product("ABCXY ", repeat=n)]
+    assert check_against_reference(engine, titles) == []
+
+
+@pytest.mark.unit
+def test_builtin_rules_all_use_the_merged_matchers():
+    assert [kind for kind, _ in model.RuleEngine(model.RULES).rule_matchers] == ["suffix"] * 12 + ["prefix"]
+
+
+@pytest.mark.unit
+def test_validate_cli_compares_with_re_sub(tmp_path, monkeypatch, capsys):
+    corpus = tmp_path / "corpus.csv"
+    corpus.write_text("GOTHAM -RPT\nC A B\n", encoding="utf-8")
+    pack = tmp_path / "pack.json"
+    pack.write_text(json.dumps({"version": "x", "rules": ["( B| A B)$"]}), encoding="utf-8")
+    assert main(["validate", "--corpus", str(corpus), str(pack)]) == 0
+    # An engine that strays from re.sub is caught
+    monkeypatch.setattr(model.RuleEngine, "normalise", lambda self, title, trace=None: title[:-1])
+    assert main(["validate", "--corpus", str(corpus), str(pack)]) == 1
+    assert "differ from re.sub" in capsys.readouterr().err
+
+
+@pytest.mark.unit
+def test_normalise_many_follows_spec():
+    """Worker processes get the parent's rules as a spec rather than using their own."""
+    engine = parse_rule_pack({"version": "t2", "rules": [" XYZ$"]})
+    assert model.normalise_many(["SHOW XYZ", "SHOW -RPT"], engine.spec()) == ["SHOW", "SHOW -RPT"]
+    assert model.normalise_many(["SHOW -RPT"]) == ["SHOW"]
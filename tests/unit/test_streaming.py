@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+from app.streaming import LineTooLong, iter_line_chunks, parse_line
+
+# ---------------------------
+# Unit tests for stream parsing
+# ---------------------------
+
+async def _agen(items):
+    for item in items:
+        yield item
+
+
+def _collect(chunks, **kwargs):
+    async def run():
+        return [lines async for lines in iter_line_chunks(_agen(chunks), **kwargs)]
+    return asyncio.run(run())
+
+
+@pytest.mark.unit
+def test_iter_line_chunks_carries_partial_lines():
+    assert _collect([b"AB", b"C\nD", b"", b"E\nF"]) == [[b"ABC"], [b"DE"], [b"F"]]
+
+
+@pytest.mark.unit
+def test_iter_line_chunks_rejects_overlong_line():
+    with pytest.raises(LineTooLong) as info:
+        _collect([b"x" * 10, b"x" * 10], max_line_bytes=16)
+    assert info.value.line == 1
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "chunks,line",
+    [
+        ([b"A\nB\n" + b"X" * 20, b"\nC\n"], 3),   # carried partial line grows too long
+        ([b"A\nB\n" + b"X" * 20 + b"\nC\n"], 3),  # overlong line complete within one chunk
+        ([b"A\nB", b"\n" + b"X" * 20 + b"\nC\n"], 3),
+    ],
+)
+def test_iter_line_chunks_yields_lines_before_overlong_one(chunks, line):
+    seen = []
+
+    async def run():
+        async for lines in iter_line_chunks(_agen(chunks), max_line_bytes=16):
+            seen.extend(lines)
+
+    with pytest.raises(LineTooLong) as info:
+        asyncio.run(run())
+    assert seen == [b"A", b"B"]
+    assert info.value.line == line
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "line,ndjson,expected",
+    [
+        (b"GOTHAM -RPT\r", False, "GOTHAM -RPT"),
+        (b"", False, ""),
+        (b"   ", True, None),
+        (b'"GOTHAM -RPT"', True, "GOTHAM -RPT"),
+        (b'{"messy_title": "GOTHAM -RPT"}', True, "GOTHAM -RPT"),
+    ],
+)
+def test_parse_line(line, ndjson, expected):
+    assert parse_line(line, ndjson) == expected
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("line", [b"{bad", b"42", b'{"title": "X"}', b"\xff"])
+def test_parse_line_rejects_invalid_ndjson(line):
+    with pytest.raises(ValueError):
+        parse_line(line, True)